@@ -4,11 +4,12 @@ Microsoft Graph APIを使用してSharePointからPPTXファイルを取得し
 バッチ処理パイプラインで大規模にインデックス化
 """
 
-from .sharepoint_client import SharePointClient
+from .sharepoint_client import SharePointClient, FileInfo
 from .sync_pipeline import SharePointSyncPipeline, SyncConfig
 
 __all__ = [
     'SharePointClient',
+    'FileInfo',
     'SharePointSyncPipeline',
     'SyncConfig'
 ]
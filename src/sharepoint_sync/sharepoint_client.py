@@ -4,11 +4,13 @@ Microsoft Graph APIを使用してSharePointからPPTXファイルを取得
 """
 
 import asyncio
+import os
 import aiohttp
-import aiofiles
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import List, Dict, NamedTuple, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from urllib.parse import unquote
 import logging
 
 from azure.identity.aio import ClientSecretCredential
@@ -17,6 +19,91 @@ from msgraph.generated.models.o_data_errors.o_data_error import ODataError
 
 logger = logging.getLogger(__name__)
 
+# 対象拡張子（str.endswithにタプルで一括判定）
+PPTX_EXTENSIONS = ('.pptx', '.ppt')
+
+# Officeのロックファイル（~$）と隠しファイル（.）の先頭文字
+SKIP_NAME_PREFIXES = ('~$', '.')
+
+# ダウンロードの読み込み単位（大きめにしてシステムコール回数を削減）
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    """
+    Retry-Afterヘッダーの値を待機秒数に変換
+
+    Args:
+        value: ヘッダー値（秒数、またはHTTP-date形式の日時）
+
+    Returns:
+        待機秒数（解釈できない場合はNone）
+    """
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _parent_folder_path(parent_reference) -> Optional[str]:
+    """
+    parentReference.path（例: '/drive/root:/a/b'）からルート相対のフォルダパスを取得
+
+    Args:
+        parent_reference: driveItemのparentReference
+
+    Returns:
+        フォルダパス（ルート直下は空文字、pathが返されていない場合はNone）
+    """
+    if parent_reference is None or not parent_reference.path:
+        return None
+    # '/drive/root:' または '/drives/{drive-id}/root:' 以降がルートからの相対パス（パーセントエンコード済み）
+    _, sep, relative = parent_reference.path.partition("root:")
+    if not sep:
+        return None
+    return unquote(relative.strip("/"))
+
+
+class FileInfo(NamedTuple):
+    """
+    SharePoint上のPPTXファイル情報
+    （ファイル毎のdictより省メモリで、属性アクセスも高速）
+    ※ id〜size の並びは processed_files へのINSERTのカラム順と一致させること
+    """
+    id: str
+    name: str
+    web_url: Optional[str]
+    path: Optional[str]
+    site_id: Optional[str]
+    drive_id: Optional[str]
+    modified: datetime
+    size: int
+    download_url: Optional[str] = None
+    local_path: Optional[Path] = None  # ダウンロード後に設定
+    doc_id: Optional[str] = None  # ドキュメントID計算後に設定
+
+
+class ThrottledError(Exception):
+    """SharePointからのスロットリング応答（HTTP 429/503）"""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        """
+        Args:
+            status: HTTPステータスコード
+            retry_after: Retry-Afterヘッダーの待機秒数（指定なしの場合はNone）
+        """
+        super().__init__(f"スロットリング: HTTP {status} (Retry-After: {retry_after})")
+        self.status = status
+        self.retry_after = retry_after
+
 
 class SharePointClient:
     """SharePoint Onlineクライアント"""
@@ -26,7 +113,9 @@ class SharePointClient:
         tenant_id: str,
         client_id: str,
         client_secret: str,
-        scopes: Optional[List[str]] = None
+        scopes: Optional[List[str]] = None,
+        max_concurrent_requests: int = 8,
+        max_connections: int = 16
     ):
         """
         Args:
@@ -34,11 +123,22 @@ class SharePointClient:
             client_id: アプリケーション（クライアント）ID
             client_secret: クライアントシークレット
             scopes: アクセススコープ（デフォルト: ['https://graph.microsoft.com/.default']）
+            max_concurrent_requests: フォルダ探索時のGraph API同時リクエスト数
+            max_connections: ダウンロード用HTTPセッションの最大同時接続数
         """
         self.tenant_id = tenant_id
         self.client_id = client_id
         self.client_secret = client_secret
         self.scopes = scopes or ['https://graph.microsoft.com/.default']
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_connections = max_connections
+
+        # サイトID・ドライブIDのメモ（同じサイトへの問い合わせを省略）
+        self._site_ids: Dict[str, str] = {}
+        self._drive_ids: Dict[Tuple[str, str], str] = {}
+
+        # ダウンロード用HTTPセッション（初回ダウンロード時に作成し、全ファイルで共有）
+        self._session: Optional[aiohttp.ClientSession] = None
 
         # 認証情報
         self.credential = ClientSecretCredential(
@@ -53,6 +153,30 @@ class SharePointClient:
             scopes=self.scopes
         )
 
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        共有HTTPセッションを取得（TLS/DNS/TCP接続をファイル間で再利用）
+
+        Returns:
+            aiohttp.ClientSession
+        """
+        if self._session is None or self._session.closed:
+            # ダウンロード先はほぼ同一ホストのため、ホスト毎の上限も同じ値にする
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    limit_per_host=self.max_connections,
+                    ttl_dns_cache=300
+                )
+            )
+        return self._session
+
     async def get_site_id(self, site_url: str) -> str:
         """
         SharePointサイトURLからサイトIDを取得
@@ -64,6 +188,9 @@ class SharePointClient:
         Returns:
             サイトID
         """
+        if site_url in self._site_ids:
+            return self._site_ids[site_url]
+
         try:
             # URLからホスト名とサイトパスを抽出
             from urllib.parse import urlparse
@@ -77,6 +204,7 @@ class SharePointClient:
             ).get()
 
             logger.info(f"Site ID取得成功: {site.id}")
+            self._site_ids[site_url] = site.id
             return site.id
 
         except ODataError as e:
@@ -94,12 +222,16 @@ class SharePointClient:
         Returns:
             ドライブID
         """
+        if (site_id, drive_name) in self._drive_ids:
+            return self._drive_ids[(site_id, drive_name)]
+
         try:
             drives = await self.graph_client.sites.by_site_id(site_id).drives.get()
 
             for drive in drives.value:
                 if drive.name == drive_name:
                     logger.info(f"Drive ID取得成功: {drive.id} (名前: {drive_name})")
+                    self._drive_ids[(site_id, drive_name)] = drive.id
                     return drive.id
 
             raise ValueError(f"ドライブ '{drive_name}' が見つかりません")
@@ -113,65 +245,270 @@ class SharePointClient:
         site_id: str,
         drive_id: str,
         folder_path: str = ""
-    ) -> List[Dict]:
+    ) -> List[FileInfo]:
         """
         SharePointドライブからすべてのPPTXファイルを再帰的に取得
+        サブフォルダは並行して探索（同時リクエスト数は max_concurrent_requests で制限）
 
         Args:
             site_id: サイトID
             drive_id: ドライブID
             folder_path: フォルダパス（ルートからの相対パス、例: "Design Guides"）
 
+        Returns:
+            PPTXファイル情報のリスト
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        return await self._list_folder(site_id, drive_id, folder_path, semaphore)
+
+    async def _list_folder(
+        self,
+        site_id: str,
+        drive_id: str,
+        folder_path: str,
+        semaphore: asyncio.Semaphore
+    ) -> List[FileInfo]:
+        """
+        フォルダ内のPPTXファイルを取得し、サブフォルダを並行して探索
+
+        Args:
+            site_id: サイトID
+            drive_id: ドライブID
+            folder_path: フォルダパス（ルートからの相対パス）
+            semaphore: Graph APIへの同時リクエスト数の制限
+
         Returns:
             PPTXファイル情報のリスト
         """
         pptx_files = []
+        subfolder_paths = []
 
         try:
-            if folder_path:
-                # 特定フォルダ内のアイテムを取得
-                items = await self.graph_client.sites.by_site_id(site_id)\
-                    .drives.by_drive_id(drive_id)\
-                    .root.item_with_path(folder_path)\
-                    .children.get()
-            else:
-                # ルートフォルダのアイテムを取得
-                items = await self.graph_client.sites.by_site_id(site_id)\
-                    .drives.by_drive_id(drive_id)\
-                    .root.children.get()
+            # API呼び出し中のみセマフォを保持（再帰探索中に保持するとデッドロックする）
+            async with semaphore:
+                if folder_path:
+                    # 特定フォルダ内のアイテムを取得
+                    items = await self.graph_client.sites.by_site_id(site_id)\
+                        .drives.by_drive_id(drive_id)\
+                        .root.item_with_path(folder_path)\
+                        .children.get()
+                else:
+                    # ルートフォルダのアイテムを取得
+                    items = await self.graph_client.sites.by_site_id(site_id)\
+                        .drives.by_drive_id(drive_id)\
+                        .root.children.get()
 
             for item in items.value:
-                # フォルダの場合は再帰的に探索
+                # フォルダの場合は後でまとめて並行探索
                 if item.folder:
-                    subfolder_path = f"{folder_path}/{item.name}" if folder_path else item.name
-                    sub_files = await self.list_pptx_files(
-                        site_id, drive_id, subfolder_path
+                    subfolder_paths.append(
+                        f"{folder_path}/{item.name}" if folder_path else item.name
                     )
-                    pptx_files.extend(sub_files)
-
-                # PPTXファイルの場合は情報を保存
-                elif item.file and item.name.lower().endswith(('.pptx', '.ppt')):
-                    file_info = {
-                        'id': item.id,
-                        'name': item.name,
-                        'web_url': item.web_url,
-                        'download_url': item.additional_data.get('@microsoft.graph.downloadUrl'),
-                        'modified': item.last_modified_date_time,
-                        'size': item.size,
-                        'path': f"{folder_path}/{item.name}" if folder_path else item.name,
-                        'site_id': site_id,
-                        'drive_id': drive_id
-                    }
-                    pptx_files.append(file_info)
 
-            logger.info(f"検出ファイル数: {len(pptx_files)} (フォルダ: {folder_path or 'root'})")
-            return pptx_files
+                # PPTXファイルの場合は情報を保存（ロックファイル等は除外）
+                elif (
+                    item.file
+                    and item.name.lower().endswith(PPTX_EXTENSIONS)
+                    and not item.name.startswith(SKIP_NAME_PREFIXES)
+                ):
+                    file_info = FileInfo(
+                        id=item.id,
+                        name=item.name,
+                        web_url=item.web_url,
+                        download_url=item.additional_data.get('@microsoft.graph.downloadUrl'),
+                        modified=item.last_modified_date_time,
+                        size=item.size,
+                        path=f"{folder_path}/{item.name}" if folder_path else item.name,
+                        site_id=site_id,
+                        drive_id=drive_id
+                    )
+                    pptx_files.append(file_info)
 
         except ODataError as e:
             logger.error(f"ファイル一覧取得失敗: {e.error.message}")
             raise
 
-    async def search_pptx_files(self, site_id: str, query: str = "*.pptx") -> List[Dict]:
+        # サブフォルダを並行して再帰探索
+        sub_results = await asyncio.gather(*(
+            self._list_folder(site_id, drive_id, subfolder_path, semaphore)
+            for subfolder_path in subfolder_paths
+        ))
+        for sub_files in sub_results:
+            pptx_files.extend(sub_files)
+
+        logger.info(f"検出ファイル数: {len(pptx_files)} (フォルダ: {folder_path or 'root'})")
+        return pptx_files
+
+    async def list_pptx_files_delta(
+        self,
+        site_id: str,
+        drive_id: str,
+        folder_path: str = "",
+        delta_link: Optional[str] = None
+    ) -> Tuple[List[FileInfo], Optional[str]]:
+        """
+        ドライブのdeltaクエリでPPTXファイルを一括取得（フォルダ階層の深さに依存しない）
+
+        Args:
+            site_id: サイトID
+            drive_id: ドライブID
+            folder_path: フォルダパス（指定時はその配下のファイルのみ返す）
+            delta_link: 前回取得したdeltaリンク（指定時は前回以降の変更分のみ取得）
+
+        Returns:
+            (PPTXファイル情報のリスト, 次回の差分取得用deltaリンク)
+        """
+        delta_request = self.graph_client.drives.by_drive_id(drive_id)\
+            .items.by_drive_item_id('root').delta
+
+        # フォルダ名と親IDの対応（parentReference.path が返らない場合のパス復元用）
+        folders: Dict[str, Tuple[str, Optional[str]]] = {}
+        # 今回のレスポンスに含まれない祖先フォルダのパス（フォルダID -> パス、APIで取得）
+        fetched_folders: Dict[str, str] = {}
+        file_items = []
+
+        try:
+            response = await (delta_request.with_url(delta_link) if delta_link else delta_request).get()
+
+            while True:
+                for item in response.value or []:
+                    parent_id = item.parent_reference.id if item.parent_reference else None
+                    if item.root:
+                        folders[item.id] = ("", None)
+                    elif item.folder:
+                        folders[item.id] = (item.name, parent_id)
+                    elif (
+                        item.file
+                        and not item.deleted
+                        and item.name.lower().endswith(PPTX_EXTENSIONS)
+                        and not item.name.startswith(SKIP_NAME_PREFIXES)
+                    ):
+                        file_items.append(item)
+
+                # @odata.nextLink がなくなるまでページを辿る
+                next_link = response.odata_next_link
+                if not next_link:
+                    break
+                response = await delta_request.with_url(next_link).get()
+
+        except ODataError as e:
+            logger.error(f"deltaファイル一覧取得失敗: {e.error.message}")
+            raise
+
+        async def resolve_path(item) -> str:
+            # parentReference.path があればそのまま使う
+            parent_path = _parent_folder_path(item.parent_reference)
+            if parent_path is not None:
+                return parent_path
+
+            # 今回のレスポンスに含まれるフォルダを親方向に辿る
+            parts = []
+            folder_id = item.parent_reference.id if item.parent_reference else None
+            while folder_id in folders:
+                name, folder_id = folders[folder_id]
+                if name:
+                    parts.append(name)
+
+            # 差分取得では変更のない祖先フォルダは返らないため、残りはAPIで取得
+            if folder_id is not None:
+                if folder_id not in fetched_folders:
+                    fetched_folders[folder_id] = await self._get_folder_path(drive_id, folder_id)
+                if fetched_folders[folder_id]:
+                    parts.append(fetched_folders[folder_id])
+            return "/".join(reversed(parts))
+
+        prefix = folder_path.strip("/")
+        pptx_files = []
+        for item in file_items:
+            parent_path = await resolve_path(item)
+            path = f"{parent_path}/{item.name}" if parent_path else item.name
+            if prefix and not path.startswith(prefix + "/"):
+                continue
+
+            file_info = FileInfo(
+                id=item.id,
+                name=item.name,
+                web_url=item.web_url,
+                download_url=item.additional_data.get('@microsoft.graph.downloadUrl'),
+                modified=item.last_modified_date_time,
+                size=item.size,
+                path=path,
+                site_id=site_id,
+                drive_id=drive_id
+            )
+            pptx_files.append(file_info)
+
+        new_delta_link = response.odata_delta_link
+        logger.info(f"検出ファイル数(delta): {len(pptx_files)} (フォルダ: {folder_path or 'root'})")
+        return pptx_files, new_delta_link
+
+    async def _get_folder_path(self, drive_id: str, folder_id: str) -> str:
+        """
+        フォルダIDからルート相対のフォルダパスを取得
+
+        Args:
+            drive_id: ドライブID
+            folder_id: フォルダのドライブアイテムID
+
+        Returns:
+            フォルダパス（ルートの場合は空文字）
+        """
+        try:
+            item = await self.graph_client.drives.by_drive_id(drive_id)\
+                .items.by_drive_item_id(folder_id).get()
+        except ODataError as e:
+            logger.error(f"フォルダ情報取得失敗 ({folder_id}): {e.error.message}")
+            raise
+
+        if item.root:
+            return ""
+        parent_path = _parent_folder_path(item.parent_reference)
+        return f"{parent_path}/{item.name}" if parent_path else item.name
+
+    async def get_file_info(
+        self,
+        site_id: str,
+        drive_id: str,
+        item_id: str,
+        path: Optional[str] = None
+    ) -> Optional[FileInfo]:
+        """
+        アイテムIDからファイル情報（最新の更新日時・ダウンロードURL）を取得
+
+        Args:
+            site_id: サイトID
+            drive_id: ドライブID
+            item_id: ドライブアイテムID
+            path: ファイルパス（deltaレスポンスと同様にパスは返らないため、既知の値を設定）
+
+        Returns:
+            ファイル情報（削除済みの場合はNone）
+        """
+        try:
+            item = await self.graph_client.drives.by_drive_id(drive_id)\
+                .items.by_drive_item_id(item_id).get()
+        except ODataError as e:
+            if e.response_status_code == 404:
+                return None
+            logger.error(f"ファイル情報取得失敗 ({item_id}): {e.error.message}")
+            raise
+
+        if item.deleted or not item.file:
+            return None
+
+        return FileInfo(
+            id=item.id,
+            name=item.name,
+            web_url=item.web_url,
+            download_url=item.additional_data.get('@microsoft.graph.downloadUrl'),
+            modified=item.last_modified_date_time,
+            size=item.size,
+            path=path or item.name,
+            site_id=site_id,
+            drive_id=drive_id
+        )
+
+    async def search_pptx_files(self, site_id: str, query: str = "*.pptx") -> List[FileInfo]:
         """
         SharePointサイト全体からPPTXファイルを検索
 
@@ -208,16 +545,17 @@ class SharePointClient:
                 for hit in result_set.hits_containers[0].hits:
                     resource = hit.resource
                     if hasattr(resource, 'name'):
-                        file_info = {
-                            'id': resource.id,
-                            'name': resource.name,
-                            'web_url': resource.web_url,
-                            'download_url': resource.additional_data.get('@microsoft.graph.downloadUrl'),
-                            'modified': resource.last_modified_date_time,
-                            'size': resource.size,
-                            'path': resource.additional_data.get('path', ''),
-                            'site_id': site_id
-                        }
+                        file_info = FileInfo(
+                            id=resource.id,
+                            name=resource.name,
+                            web_url=resource.web_url,
+                            download_url=resource.additional_data.get('@microsoft.graph.downloadUrl'),
+                            modified=resource.last_modified_date_time,
+                            size=resource.size,
+                            path=resource.additional_data.get('path', ''),
+                            site_id=site_id,
+                            drive_id=None
+                        )
                         pptx_files.append(file_info)
 
             logger.info(f"検索結果: {len(pptx_files)}件")
@@ -231,7 +569,7 @@ class SharePointClient:
         self,
         download_url: str,
         local_path: Path,
-        chunk_size: int = 8192
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE
     ) -> Path:
         """
         SharePointからファイルをダウンロード
@@ -248,15 +586,29 @@ class SharePointClient:
             # 親ディレクトリを作成
             local_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # ダウンロード
-            async with aiohttp.ClientSession() as session:
-                async with session.get(download_url) as resp:
-                    if resp.status != 200:
-                        raise Exception(f"ダウンロード失敗: HTTP {resp.status}")
+            # ダウンロード（共有セッションを使用）
+            session = self._get_session()
+            async with session.get(download_url) as resp:
+                if resp.status in (429, 503):
+                    # スロットリング時はRetry-After（秒）を呼び出し元のリトライ待機に渡す
+                    raise ThrottledError(
+                        resp.status,
+                        _parse_retry_after(resp.headers.get('Retry-After', ''))
+                    )
+                if resp.status != 200:
+                    raise Exception(f"ダウンロード失敗: HTTP {resp.status}")
+
+                # 1MiB単位の書き込みは十分速いため、スレッド経由(aiofiles)ではなく直接書き込む
+                with open(local_path, 'wb') as f:
+                    # サイズが分かる場合は領域を事前確保して断片化を防ぐ
+                    if resp.content_length and hasattr(os, 'posix_fallocate'):
+                        try:
+                            os.posix_fallocate(f.fileno(), 0, resp.content_length)
+                        except OSError:
+                            pass
 
-                    async with aiofiles.open(local_path, 'wb') as f:
-                        async for chunk in resp.content.iter_chunked(chunk_size):
-                            await f.write(chunk)
+                    async for chunk in resp.content.iter_chunked(chunk_size):
+                        f.write(chunk)
 
             logger.info(f"ダウンロード完了: {local_path}")
             return local_path
@@ -267,6 +619,8 @@ class SharePointClient:
 
     async def close(self):
         """リソースのクリーンアップ"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
         await self.credential.close()
 
 
@@ -300,8 +654,8 @@ async def main_example():
 
         # 最初の5ファイルをダウンロード
         for file_info in pptx_files[:5]:
-            local_path = Path(f"data/pptx_temp/{file_info['id']}.pptx")
-            await client.download_file(file_info['download_url'], local_path)
+            local_path = Path(f"data/pptx_temp/{file_info.id}.pptx")
+            await client.download_file(file_info.download_url, local_path)
 
     finally:
         await client.close()
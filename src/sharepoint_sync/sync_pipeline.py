@@ -4,23 +4,88 @@ SharePoint同期とバッチ処理パイプライン
 """
 
 import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 from datetime import datetime
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import hashlib
+import mmap
+import shutil
+import uuid
+import ssl
 import yaml
 from dataclasses import dataclass
 
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-from sharepoint_client import SharePointClient
+try:
+    import blake3  # オプション: doc_id_hash: "blake3" で使用
+except ImportError:
+    blake3 = None
+
+from sharepoint_client import SharePointClient, FileInfo, ThrottledError
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
-from utils.db_manager import ProcessedFilesDB
+from utils.db_manager import ProcessedFilesDB, AsyncProcessedFilesDB
 
 logger = logging.getLogger(__name__)
 
+# ハッシュ計算時の読み込みバッファサイズ（256KiB）
+HASH_BUFFER_SIZE = 1 << 18
+
+# これ以上のサイズのファイルはmmapでハッシュ計算（4MiB）
+MMAP_HASH_THRESHOLD = 4 * 1024 * 1024
+
+# ハッシュ計算の並列スレッド数（ディスクI/O待ちを重ねるためCPU数の2倍、最大8）
+HASH_MAX_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# サイトID・ドライブIDのキャッシュ有効期間（時間）
+SITE_CACHE_TTL_HOURS = 24
+
+# ダウンロードリトライの待機（指数バックオフ）
+DOWNLOAD_RETRY_BACKOFF = wait_exponential(multiplier=1, min=4, max=60)
+
+# Retry-After に従う待機の上限（秒）。不正な値でダウンロードワーカーが止まり続けないようにする
+MAX_RETRY_AFTER_SECONDS = 120
+
+
+def wait_retry_after(retry_state) -> float:
+    """
+    ダウンロードリトライの待機秒数を決定
+    スロットリング時はサーバー指定のRetry-After（上限 MAX_RETRY_AFTER_SECONDS）に従い、それ以外は指数バックオフ
+
+    Args:
+        retry_state: tenacityのリトライ状態
+
+    Returns:
+        待機秒数
+    """
+    error = retry_state.outcome.exception()
+    if isinstance(error, ThrottledError) and error.retry_after is not None:
+        return min(error.retry_after, MAX_RETRY_AFTER_SECONDS)
+    return DOWNLOAD_RETRY_BACKOFF(retry_state)
+
+
+def cpu_has_sha_ni() -> Optional[bool]:
+    """
+    CPUがSHA拡張命令（SHA-NI）に対応しているか判定
+
+    Returns:
+        対応していればTrue、非対応ならFalse、判定できない場合（Linux以外等）はNone
+    """
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return 'sha_ni' in line.split()
+    except OSError:
+        pass
+    return None
+
 
 @dataclass
 class SyncConfig:
@@ -30,10 +95,11 @@ class SyncConfig:
     client_secret: str
     site_urls: List[str]
     batch_size: int = 50
-    parallel_downloads: int = 10
+    parallel_downloads: int = 32
     retry_attempts: int = 3
     temp_dir: Path = Path("data/pptx_temp")
     db_path: Path = Path("data/processed_files.db")
+    doc_id_hash: str = "sha1"  # hashlib名（"blake2b", "sha256" 等）または "blake3"
 
 
 class SharePointSyncPipeline:
@@ -45,7 +111,24 @@ class SharePointSyncPipeline:
             config: 同期設定
         """
         self.config = config
+
+        # doc_id用ハッシュアルゴリズム
+        # 計算済みdoc_idを再利用するため、環境によって別のアルゴリズムに切り替えると
+        # 同じコーパスに異なるハッシュのIDが混在する。blake3が使えない場合は代替せずエラーにする
+        self.doc_id_hash = config.doc_id_hash
+        if self.doc_id_hash == 'blake3' and blake3 is None:
+            raise ValueError(
+                "doc_id_hash に blake3 が指定されていますが、blake3パッケージがインストールされていません"
+                "（pip install blake3）"
+            )
+
+        # 未対応のハッシュアルゴリズムは起動時にエラーにする
+        if self.doc_id_hash != 'blake3':
+            hashlib.new(self.doc_id_hash)
+
         self.db = ProcessedFilesDB(config.db_path)
+        # 非同期処理からはスレッド経由でアクセスし、イベントループをブロックしない
+        self.adb = AsyncProcessedFilesDB(self.db)
         self.client: Optional[SharePointClient] = None
 
         # 一時ディレクトリ作成
@@ -56,11 +139,14 @@ class SharePointSyncPipeline:
         self.client = SharePointClient(
             tenant_id=self.config.tenant_id,
             client_id=self.config.client_id,
-            client_secret=self.config.client_secret
+            client_secret=self.config.client_secret,
+            max_connections=self.config.parallel_downloads
         )
         logger.info("SharePointクライアント初期化完了")
+        sha_ni = {True: '有効', False: '無効', None: '不明'}[cpu_has_sha_ni()]
+        logger.info(f"doc_idハッシュ: {self.doc_id_hash} ({ssl.OPENSSL_VERSION}, SHA-NI: {sha_ni})")
 
-    async def discover_files(self, incremental: bool = True) -> List[Dict]:
+    async def discover_files(self, incremental: bool = True) -> List[FileInfo]:
         """
         SharePointからPPTXファイルを検出
 
@@ -71,102 +157,241 @@ class SharePointSyncPipeline:
             処理対象ファイルのリスト
         """
         all_files = []
+        # 登録完了後に保存する次回用deltaリンク（ドライブID -> リンク）
+        delta_links: Dict[str, str] = {}
+
+        # 増分処理では保存済みdeltaリンクで差分だけ取得
+        # （未完了・失敗ファイルは差分に含まれなくても、登録後にDBから拾い直す）
+        use_delta_link = incremental
 
         for site_url in self.config.site_urls:
             logger.info(f"サイトをスキャン中: {site_url}")
 
             try:
-                # サイトIDとドライブIDを取得
-                site_id = await self.client.get_site_id(site_url)
-                drive_id = await self.client.get_drive_id(site_id)
-
-                # PPTXファイルを取得
-                files = await self.client.list_pptx_files(
-                    site_id=site_id,
-                    drive_id=drive_id
-                )
+                # サイトIDとドライブIDを取得（キャッシュがあれば再利用）
+                site_id, drive_id = await self.resolve_site(site_url)
+
+                # PPTXファイルを取得（deltaクエリで一括取得、失敗時はフォルダを再帰探索）
+                try:
+                    files, new_delta_link = await self.list_files_delta(
+                        site_id, drive_id, use_delta_link
+                    )
+                    if new_delta_link:
+                        delta_links[drive_id] = new_delta_link
+                except Exception as e:
+                    logger.warning(f"deltaクエリ失敗、フォルダ探索に切り替え ({site_url}): {e}")
+                    files = await self.client.list_pptx_files(
+                        site_id=site_id,
+                        drive_id=drive_id
+                    )
 
                 all_files.extend(files)
                 logger.info(f"検出: {len(files)}件 ({site_url})")
 
             except Exception as e:
                 logger.error(f"サイトスキャン失敗 ({site_url}): {e}")
+                # キャッシュしたIDが古い可能性があるため、次回は再取得
+                await self.adb.delete_cached_site(site_url)
                 continue
 
-        logger.info(f"総検出ファイル数: {len(all_files)}")
+        # 同じファイルが重複して検出された場合（site_urlsの重複等）は1件にまとめる
+        all_files = list({file_info.id: file_info for file_info in all_files}.values())
 
-        # データベースに登録し、処理が必要なファイルをフィルタ
-        files_to_process = []
-        for file_info in all_files:
-            needs_processing = self.db.add_or_update_file(file_info)
+        logger.info(f"総検出ファイル数: {len(all_files)}")
 
-            if needs_processing or not incremental:
-                files_to_process.append(file_info)
+        # データベースに一括登録し、処理が必要なファイルをフィルタ
+        # （deltaリンクは登録と同じトランザクションで保存し、登録失敗時は進めない）
+        changed_ids = await self.adb.add_or_update_files(all_files, delta_links)
+        files_to_process = [
+            file_info for file_info in all_files
+            if file_info.id in changed_ids or not incremental
+        ]
+        if incremental:
+            files_to_process.extend(await self.collect_unfinished_files(all_files, changed_ids))
 
         logger.info(f"処理対象ファイル数: {len(files_to_process)}")
         return files_to_process
 
+    async def collect_unfinished_files(
+        self,
+        listed_files: List[FileInfo],
+        changed_ids: Set[str]
+    ) -> List[FileInfo]:
+        """
+        前回までに処理が完了していない（処理待ち・失敗）ファイルを処理対象として取得
+        今回の一覧に含まれないファイルは、ダウンロードURLを得るためアイテムIDから再取得
+
+        Args:
+            listed_files: 今回SharePointから取得したファイル情報
+            changed_ids: 今回の登録で処理対象となったファイルID（重複して追加しない）
+
+        Returns:
+            追加で処理するファイル情報のリスト
+        """
+        listed_by_id = {file_info.id: file_info for file_info in listed_files}
+        unfinished = []
+        to_fetch = []
+        for row in await self.adb.get_unfinished_files():
+            if row['file_id'] in changed_ids:
+                continue
+            if row['file_id'] in listed_by_id:
+                unfinished.append(listed_by_id[row['file_id']])
+            elif row['drive_id']:
+                to_fetch.append(row)
+
+        semaphore = asyncio.Semaphore(self.client.max_concurrent_requests)
+
+        async def fetch(row) -> Optional[FileInfo]:
+            async with semaphore:
+                return await self.client.get_file_info(
+                    row['site_id'], row['drive_id'], row['file_id'], row['sharepoint_path']
+                )
+
+        fetched = await asyncio.gather(*(fetch(row) for row in to_fetch), return_exceptions=True)
+        for row, result in zip(to_fetch, fetched):
+            if isinstance(result, BaseException):
+                # 次回の実行で再度取得を試みる
+                logger.warning(f"未完了ファイルの情報取得失敗 ({row['file_name']}): {result}")
+            elif result is None:
+                logger.info(f"SharePointから削除済みのため処理対象外: {row['file_name']}")
+                await self.adb.update_status(row['file_id'], 'deleted')
+            else:
+                unfinished.append(result)
+
+        if unfinished:
+            logger.info(f"未完了ファイルを処理対象に追加: {len(unfinished)}件")
+        return unfinished
+
+    async def resolve_site(self, site_url: str) -> Tuple[str, str]:
+        """
+        サイトURLからサイトIDとドライブIDを取得
+        有効期間内のキャッシュがあればGraph APIへの問い合わせを省略
+
+        Args:
+            site_url: SharePointサイトURL
+
+        Returns:
+            (サイトID, ドライブID)
+        """
+        cached = await self.adb.get_cached_site(site_url, SITE_CACHE_TTL_HOURS)
+        if cached:
+            return cached
+
+        site_id = await self.client.get_site_id(site_url)
+        drive_id = await self.client.get_drive_id(site_id)
+        await self.adb.save_site(site_url, site_id, drive_id)
+        return site_id, drive_id
+
+    async def list_files_delta(
+        self,
+        site_id: str,
+        drive_id: str,
+        use_delta_link: bool
+    ) -> Tuple[List[FileInfo], Optional[str]]:
+        """
+        deltaクエリでPPTXファイルを取得
+        次回用のdeltaリンクは保存せずに返し、呼び出し側でファイル登録と同時に保存する
+
+        Args:
+            site_id: サイトID
+            drive_id: ドライブID
+            use_delta_link: True の場合、保存済みdeltaリンクで前回以降の変更分のみ取得
+
+        Returns:
+            (PPTXファイル情報のリスト, 次回の差分取得用deltaリンク)
+        """
+        delta_link = await self.adb.get_delta_link(drive_id) if use_delta_link else None
+
+        try:
+            files, new_delta_link = await self.client.list_pptx_files_delta(
+                site_id=site_id,
+                drive_id=drive_id,
+                delta_link=delta_link
+            )
+        except Exception as e:
+            if not delta_link:
+                raise
+            # deltaリンクの期限切れ（410 resyncRequired）等は全件取得からやり直す
+            logger.warning(f"差分取得失敗、全件取得に切り替え: {e}")
+            files, new_delta_link = await self.client.list_pptx_files_delta(
+                site_id=site_id,
+                drive_id=drive_id
+            )
+
+        if delta_link:
+            logger.info(f"差分取得: {len(files)}件の変更")
+
+        return files, new_delta_link
+
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=60),
+        wait=wait_retry_after,
         reraise=True
     )
-    async def download_file_with_retry(self, file_info: Dict) -> Path:
+    async def download_file_with_retry(
+        self,
+        file_info: FileInfo,
+        dest_dir: Optional[Path] = None
+    ) -> Path:
         """
         ファイルをダウンロード（リトライ付き）
 
         Args:
             file_info: ファイル情報
+            dest_dir: 保存先ディレクトリ（デフォルト: config.temp_dir）
 
         Returns:
             ダウンロードしたファイルのパス
         """
-        local_path = self.config.temp_dir / f"{file_info['id']}.pptx"
+        local_path = (dest_dir or self.config.temp_dir) / f"{file_info.id}.pptx"
 
         try:
             await self.client.download_file(
-                file_info['download_url'],
+                file_info.download_url,
                 local_path
             )
-            self.db.add_log(file_info['id'], 'download', f"ダウンロード成功: {local_path}")
+            await self.adb.add_log(file_info.id, 'download', f"ダウンロード成功: {local_path}")
             return local_path
 
         except Exception as e:
-            logger.error(f"ダウンロードエラー ({file_info['name']}): {e}")
-            self.db.add_log(file_info['id'], 'download', f"ダウンロード失敗: {e}")
+            logger.error(f"ダウンロードエラー ({file_info.name}): {e}")
+            await self.adb.add_log(file_info.id, 'download', f"ダウンロード失敗: {e}")
             raise
 
-    async def download_batch(self, files: List[Dict]) -> List[Dict]:
+    async def download_one(
+        self,
+        file_info: FileInfo,
+        semaphore: asyncio.Semaphore,
+        dest_dir: Optional[Path] = None
+    ) -> Optional[FileInfo]:
         """
-        ファイルを並列ダウンロード
+        同時実行数を制限してファイルをダウンロード
 
         Args:
-            files: ファイル情報のリスト
+            file_info: ファイル情報
+            semaphore: 同時ダウンロード数の制限
+            dest_dir: 保存先ディレクトリ（デフォルト: config.temp_dir）
 
         Returns:
-            ダウンロード成功したファイルの情報リスト
+            local_pathを付与したファイル情報（失敗時はNone）
         """
-        semaphore = asyncio.Semaphore(self.config.parallel_downloads)
-
-        async def download_with_semaphore(file_info):
-            async with semaphore:
-                try:
-                    local_path = await self.download_file_with_retry(file_info)
-                    return {**file_info, 'local_path': local_path}
-                except Exception as e:
-                    logger.error(f"ダウンロード最終失敗 ({file_info['name']}): {e}")
-                    self.db.update_status(file_info['id'], 'failed', str(e))
-                    return None
-
-        # 並列ダウンロード実行
-        download_tasks = [download_with_semaphore(f) for f in files]
-        results = await asyncio.gather(*download_tasks)
+        async with semaphore:
+            try:
+                local_path = await self.download_file_with_retry(file_info, dest_dir)
+                return file_info._replace(local_path=local_path)
+            except Exception as e:
+                logger.error(f"ダウンロード最終失敗 ({file_info.name}): {e}")
+                await self.adb.update_status(file_info.id, 'failed', str(e))
+                return None
 
-        # 成功したファイルのみ返す
-        successful = [r for r in results if r is not None]
-        logger.info(f"ダウンロード完了: {len(successful)}/{len(files)}")
+    def _new_hash(self):
+        """
+        doc_id用のハッシュオブジェクトを生成
 
-        return successful
+        暗号用途ではないため usedforsecurity=False を指定し、
+        OpenSSL 3 のFIPSチェックを経由しない高速な実装を使用
+        """
+        return hashlib.new(self.doc_id_hash, usedforsecurity=False)
 
     def compute_doc_id(self, file_path: Path) -> str:
         """
@@ -176,16 +401,77 @@ class SharePointSyncPipeline:
             file_path: ファイルパス
 
         Returns:
-            ドキュメントID (SHA1ハッシュの最初の12文字)
+            ドキュメントID (config.doc_id_hash によるハッシュの最初の12文字)
         """
-        sha1 = hashlib.sha1()
+        if self.doc_id_hash == 'blake3':
+            # BLAKE3はSIMD+マルチスレッドでmmapしたファイルを直接ハッシュ
+            digest = blake3.blake3(max_threads=blake3.blake3.AUTO)
+            digest.update_mmap(file_path)
+            return digest.hexdigest()[:12]
+
         with open(file_path, 'rb') as f:
-            while chunk := f.read(8192):
-                sha1.update(chunk)
+            file_size = os.fstat(f.fileno()).st_size
+
+            if file_size >= MMAP_HASH_THRESHOLD:
+                # 大きなファイルはメモリマップしてコピーなしで一括ハッシュ
+                digest = self._new_hash()
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # 先頭から順に読むことをカーネルに伝え、先読みを強化（Linux等）
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    digest.update(mm)
+            # Python 3.11+ はC実装のfile_digestでGILを解放しながらハッシュ計算
+            elif hasattr(hashlib, 'file_digest'):
+                digest = hashlib.file_digest(f, self._new_hash)
+            else:
+                # 再利用バッファに読み込み、チャンク毎のbytes生成を回避
+                digest = self._new_hash()
+                buf = bytearray(HASH_BUFFER_SIZE)
+                view = memoryview(buf)
+                while n := f.readinto(buf):
+                    digest.update(view[:n])
+
+        return digest.hexdigest()[:12]
+
+    async def compute_doc_ids(self, files: List[FileInfo]) -> List[FileInfo]:
+        """
+        ダウンロード済みファイルのドキュメントIDを並列計算
+        更新日時とサイズがDBの記録と一致するファイルはハッシュ計算を省略
+
+        Args:
+            files: ダウンロード済みファイル情報のリスト
+
+        Returns:
+            doc_idを付与したファイル情報のリスト（計算失敗時は付与しない）
+        """
+        # 更新日時とサイズが前回と同じファイルは計算済みのdoc_idを再利用
+        doc_ids = await self.adb.get_cached_doc_ids(files)
+        to_hash = [f for f in files if f.id not in doc_ids]
+
+        if to_hash:
+            loop = asyncio.get_running_loop()
+            max_workers = min(HASH_MAX_WORKERS, len(to_hash))
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(executor, self.compute_doc_id, f.local_path)
+                        for f in to_hash
+                    ),
+                    return_exceptions=True
+                )
 
-        return sha1.hexdigest()[:12]
+            # 失敗したファイルはprocess_single_fileで再計算し、エラーとして記録される
+            for f, result in zip(to_hash, results):
+                if not isinstance(result, BaseException):
+                    doc_ids[f.id] = result
 
-    def process_single_file(self, file_info: Dict) -> Dict:
+        return [
+            f._replace(doc_id=doc_ids[f.id]) if f.id in doc_ids else f
+            for f in files
+        ]
+
+    def process_single_file(self, file_info: FileInfo) -> Dict:
         """
         単一ファイルを処理（テキスト抽出、レンダリング、埋め込み、インデックス）
 
@@ -195,17 +481,17 @@ class SharePointSyncPipeline:
         Returns:
             処理結果
         """
-        file_id = file_info['id']
-        local_path = file_info['local_path']
+        file_id = file_info.id
+        local_path = file_info.local_path
 
         start_time = datetime.now()
 
         try:
             self.db.update_status(file_id, 'processing')
 
-            # ドキュメントID生成
-            doc_id = self.compute_doc_id(local_path)
-            logger.info(f"処理開始: {file_info['name']} (doc_id: {doc_id})")
+            # ドキュメントID生成（compute_doc_idsで事前計算済みなら再利用）
+            doc_id = file_info.doc_id or self.compute_doc_id(local_path)
+            logger.info(f"処理開始: {file_info.name} (doc_id: {doc_id})")
 
             # ========== ここに実際の処理を実装 ==========
             #
@@ -240,7 +526,7 @@ class SharePointSyncPipeline:
                 duration=duration
             )
 
-            logger.info(f"処理完了: {file_info['name']} ({duration:.2f}秒)")
+            logger.info(f"処理完了: {file_info.name} ({duration:.2f}秒)")
 
             return {
                 'file_id': file_id,
@@ -252,7 +538,7 @@ class SharePointSyncPipeline:
 
         except Exception as e:
             duration = (datetime.now() - start_time).total_seconds()
-            logger.error(f"処理エラー ({file_info['name']}): {e}")
+            logger.error(f"処理エラー ({file_info.name}): {e}")
             self.db.update_status(file_id, 'failed', str(e), duration=duration)
 
             return {
@@ -263,36 +549,86 @@ class SharePointSyncPipeline:
 
         finally:
             # 一時ファイルを削除
-            if local_path.exists():
-                local_path.unlink()
+            local_path.unlink(missing_ok=True)
 
-    async def process_batch(self, files: List[Dict]) -> List[Dict]:
+    async def download_and_process_batch(self, files: List[FileInfo]) -> List[Dict]:
         """
-        ファイルのバッチ処理
+        ダウンロードと処理を重ねて実行
+        ダウンロードが完了したファイルから順に処理し、バッチ全体の完了を待たない
 
         Args:
-            files: ダウンロード済みファイル情報のリスト
+            files: ファイル情報のリスト
 
         Returns:
             処理結果のリスト
         """
-        # COM制約により、レンダリングは順次処理
-        # テキスト抽出と埋め込みは並列化可能（実装次第）
+        semaphore = asyncio.Semaphore(self.config.parallel_downloads)
+        downloaded: asyncio.Queue = asyncio.Queue()
+
+        # バッチ専用の一時ディレクトリ（失敗したダウンロードの残骸も含めて最後に一括削除）
+        batch_dir = self.config.temp_dir / f"batch_{uuid.uuid4().hex}"
+
+        # 個々のダウンロードはタスクとして保持し、エラー時に確実にキャンセルできるようにする
+        download_tasks = [
+            asyncio.create_task(self.download_one(f, semaphore, batch_dir)) for f in files
+        ]
 
+        async def download_all():
+            try:
+                # 完了したダウンロードから順に処理キューへ渡す
+                for download in asyncio.as_completed(download_tasks):
+                    result = await download
+                    if result is not None:
+                        await downloaded.put(result)
+            finally:
+                # 全ダウンロード終了の合図
+                await downloaded.put(None)
+
+        loop = asyncio.get_running_loop()
         results = []
-        for i, file_info in enumerate(files, 1):
-            logger.info(f"処理中: {i}/{len(files)} - {file_info['name']}")
-            result = self.process_single_file(file_info)
-            results.append(result)
+        done = False
+
+        try:
+            # COM制約により、処理は専用の1スレッドで順次実行（イベントループはダウンロードを継続）
+            with ThreadPoolExecutor(max_workers=1) as process_executor:
+                producer = asyncio.create_task(download_all())
+                try:
+                    while not done:
+                        # 待機中にダウンロード済みとなったファイルをまとめて取り出す
+                        ready = [await downloaded.get()]
+                        while not downloaded.empty():
+                            ready.append(downloaded.get_nowait())
+                        if ready[-1] is None:
+                            ready.pop()
+                            done = True
+
+                        # ドキュメントIDは取り出した分をまとめて並列計算
+                        for file_info in await self.compute_doc_ids(ready):
+                            logger.info(f"処理中: {len(results) + 1}/{len(files)} - {file_info.name}")
+                            results.append(await loop.run_in_executor(
+                                process_executor, self.process_single_file, file_info
+                            ))
+                finally:
+                    # エラー時も実行中のダウンロードを止め、終了を待ってから一時ディレクトリを削除
+                    pending = [t for t in (producer, *download_tasks) if not t.done()]
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(producer, *download_tasks, return_exceptions=True)
+        finally:
+            # executorの終了（処理スレッドで実行中のファイル処理の完了）を待ってから削除
+            shutil.rmtree(batch_dir, ignore_errors=True)
 
+        logger.info(f"ダウンロード・処理完了: {len(results)}/{len(files)}")
         return results
 
-    async def run(self, incremental: bool = True) -> Dict:
+    async def run(self, incremental: bool = True, keep_open: bool = False) -> Dict:
         """
         パイプライン全体を実行
 
         Args:
             incremental: 増分処理モード
+            keep_open: True の場合、終了後もクライアント（HTTP接続・認証トークン）と
+                データベースを開いたままにし、次回のrun()で再利用（常駐モード用）
 
         Returns:
             処理結果の統計
@@ -300,8 +636,12 @@ class SharePointSyncPipeline:
         pipeline_start = datetime.now()
 
         try:
-            # 初期化
-            await self.initialize()
+            # 初期化（前回のrun()から開いたままの場合は再利用）
+            if self.client is None:
+                await self.initialize()
+
+            # 前回の異常終了等で処理中のまま残ったファイルを処理待ちに戻す
+            await self.adb.reset_processing_files()
 
             # ファイル検出
             logger.info("=== ファイル検出フェーズ ===")
@@ -312,6 +652,7 @@ class SharePointSyncPipeline:
                 return {
                     'status': 'success',
                     'files_processed': 0,
+                    'files_failed': 0,
                     'duration_seconds': 0
                 }
 
@@ -327,13 +668,8 @@ class SharePointSyncPipeline:
 
                 logger.info(f"\n=== バッチ {batch_num}/{total_batches} ({len(batch)}ファイル) ===")
 
-                # ダウンロード
-                logger.info("ダウンロードフェーズ")
-                downloaded = await self.download_batch(batch)
-
-                # 処理
-                logger.info("処理フェーズ")
-                results = await self.process_batch(downloaded)
+                # ダウンロードと処理（ダウンロード完了したファイルから順次処理）
+                results = await self.download_and_process_batch(batch)
 
                 # 統計更新
                 for result in results:
@@ -347,8 +683,11 @@ class SharePointSyncPipeline:
             # パイプライン完了
             duration = (datetime.now() - pipeline_start).total_seconds()
 
+            # 常駐モードでも実行毎にログを確定させる
+            await self.adb.flush_logs()
+
             # 最終統計
-            stats = self.db.get_statistics()
+            stats = await self.adb.get_statistics()
 
             logger.info(f"\n=== パイプライン完了 ===")
             logger.info(f"処理時間: {duration:.2f}秒")
@@ -373,9 +712,15 @@ class SharePointSyncPipeline:
 
         finally:
             # クリーンアップ
-            if self.client:
-                await self.client.close()
-            self.db.close()
+            if not keep_open:
+                await self.close()
+
+    async def close(self):
+        """クライアントとデータベースをクローズ"""
+        if self.client:
+            await self.client.close()
+            self.client = None
+        self.db.close()
 
 
 # ========== CLI エントリーポイント ==========
@@ -401,6 +746,17 @@ async def main_cli():
         action='store_true',
         help='フルスキャンモード（すべてのファイルを再処理）'
     )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='常駐モード（接続を維持したまま --interval 秒毎に増分処理を繰り返す）'
+    )
+    parser.add_argument(
+        '--interval',
+        type=int,
+        default=3600,
+        help='常駐モードの実行間隔（秒、デフォルト: 3600）'
+    )
 
     args = parser.parse_args()
 
@@ -415,14 +771,39 @@ async def main_cli():
         client_secret=config_dict['sharepoint']['client_secret'],
         site_urls=config_dict['sharepoint']['site_urls'],
         batch_size=config_dict.get('processing', {}).get('batch_size', 50),
-        parallel_downloads=config_dict.get('processing', {}).get('parallel_downloads', 10)
+        parallel_downloads=config_dict.get('processing', {}).get('parallel_downloads', 32),
+        doc_id_hash=config_dict.get('processing', {}).get('doc_id_hash', 'sha1')
     )
 
     # パイプライン実行
     pipeline = SharePointSyncPipeline(config)
-    result = await pipeline.run(incremental=not args.full)
 
-    # 結果出力
+    if not args.daemon:
+        result = await pipeline.run(incremental=not args.full)
+        print_result(result)
+        return
+
+    # 常駐モード: HTTPセッションと認証トークンを維持し、TLS接続等の再確立を省略
+    # （--full は初回のみ適用し、2回目以降は増分処理）
+    incremental = not args.full
+    try:
+        while True:
+            result = await pipeline.run(incremental=incremental, keep_open=True)
+            print_result(result)
+            incremental = True
+            logger.info(f"次回実行まで待機: {args.interval}秒")
+            await asyncio.sleep(args.interval)
+    finally:
+        await pipeline.close()
+
+
+def print_result(result: Dict):
+    """
+    処理結果を出力
+
+    Args:
+        result: run() の戻り値
+    """
     print("\n" + "="*50)
     print("処理結果:")
     print(f"  ステータス: {result['status']}")
@@ -435,16 +816,43 @@ async def main_cli():
     print("="*50)
 
 
+def setup_logging(log_file: Path = Path('data/logs/sync_pipeline.log')) -> QueueListener:
+    """
+    ロギング設定
+
+    ファイル/コンソールへの書き込みはQueueListenerのバックグラウンドスレッドで行い、
+    処理スレッドがログI/Oで待たされないようにする
+
+    Args:
+        log_file: ログファイルパス
+
+    Returns:
+        開始済みのQueueListener（終了時にstop()を呼ぶ）
+    """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [
+        logging.FileHandler(log_file),
+        logging.StreamHandler()
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
 if __name__ == "__main__":
     # ロギング設定
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('data/logs/sync_pipeline.log'),
-            logging.StreamHandler()
-        ]
-    )
+    listener = setup_logging()
 
     # 実行
-    asyncio.run(main_cli())
+    try:
+        asyncio.run(main_cli())
+    finally:
+        listener.stop()
@@ -2,6 +2,6 @@
 ユーティリティモジュール
 """
 
-from .db_manager import ProcessedFilesDB
+from .db_manager import ProcessedFilesDB, AsyncProcessedFilesDB
 
-__all__ = ['ProcessedFilesDB']
+__all__ = ['ProcessedFilesDB', 'AsyncProcessedFilesDB']
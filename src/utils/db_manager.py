@@ -3,15 +3,247 @@
 SQLiteを使用してSharePointファイルの処理状態を追跡
 """
 
+import asyncio
 import sqlite3
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Set, Tuple, TYPE_CHECKING
 import logging
 
+if TYPE_CHECKING:
+    from sharepoint_sync.sharepoint_client import FileInfo
+
 logger = logging.getLogger(__name__)
 
 
+def adapt_timestamp(value: datetime) -> str:
+    """
+    datetimeをUTCのISO形式文字列（'YYYY-MM-DD HH:MM:SS+00:00'）に正規化して保存
+
+    Args:
+        value: 保存する日時（タイムゾーンなしはUTCとみなす）
+
+    Returns:
+        ISO形式文字列
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(" ")
+
+
+def convert_timestamp(value: bytes) -> datetime:
+    """
+    TIMESTAMP型カラムの値をUTCのdatetimeに変換
+
+    Args:
+        value: 保存されている文字列
+
+    Returns:
+        タイムゾーン付きdatetime
+    """
+    text = value.decode()
+    # 正規化前に保存された 'Z' 終端の値のみ置換が必要
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+# 書き込みは常にUTC・'+00:00'形式、読み取りはTIMESTAMP宣言カラムをdatetimeに変換
+# （接続側で detect_types=sqlite3.PARSE_DECLTYPES を指定）
+sqlite3.register_adapter(datetime, adapt_timestamp)
+sqlite3.register_converter("TIMESTAMP", convert_timestamp)
+
+
+# 一括問い合わせ1回あたりの行数（バインド変数の上限999に収まる範囲）
+SQL_BATCH_ROWS = 300
+
+# ファイル登録用SQL（単一登録と一括登録で共用）
+INSERT_FILE_SQL = """
+    INSERT INTO processed_files (
+        file_id, file_name, sharepoint_url, sharepoint_path,
+        site_id, drive_id, modified_date, file_size, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+"""
+
+# 処理済みファイルテーブル（{table} はテーブル名、移行時は一時名で作成）
+# file_idによる検索・更新のみのため WITHOUT ROWID とし、行を主キーのB-treeに直接格納
+# （TIMESTAMP型の変換を使うため STRICT は指定しない）
+CREATE_PROCESSED_FILES_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        file_id TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        sharepoint_url TEXT,
+        sharepoint_path TEXT,
+        site_id TEXT,
+        drive_id TEXT,
+        modified_date TIMESTAMP,
+        file_size INTEGER,
+        doc_id TEXT,
+        processed_at TIMESTAMP,
+        status TEXT DEFAULT 'pending',
+        error_message TEXT,
+        slide_count INTEGER,
+        processing_duration_seconds REAL
+    ) WITHOUT ROWID
+"""
+
+# INSERT_FILE_SQL / UPSERT_FILE_SQL のパラメータ数（FileInfo の id〜size に対応）
+INSERT_FIELD_COUNT = 8
+
+UPDATE_MODIFIED_SQL = """
+    UPDATE processed_files
+    SET modified_date = ?,
+        file_size = ?,
+        doc_id = NULL,
+        status = 'pending',
+        error_message = NULL
+    WHERE file_id = ?
+"""
+
+
+# ドライブ毎のdeltaリンク保存
+SAVE_DELTA_LINK_SQL = """
+    INSERT INTO sync_tokens (drive_id, delta_link, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(drive_id) DO UPDATE SET
+        delta_link = excluded.delta_link,
+        updated_at = excluded.updated_at
+"""
+
+# 一括登録時の既存レコード読み込み（{placeholders} は ? の並び、タプル行で取得）
+SELECT_EXISTING_SQL = """
+    SELECT file_id, modified_date, status FROM processed_files
+    WHERE file_id IN ({placeholders})
+"""
+
+# 処理待ちファイルの取得（idx_pending_cov のみで完結する列に限定）
+# LIMIT はバインド変数とし、-1（無制限）を含め常に同じSQL文を再利用する
+SELECT_PENDING_SQL = """
+    SELECT file_id, file_name, sharepoint_url, site_id, drive_id,
+           modified_date, file_size
+    FROM processed_files
+    WHERE status = 'pending'
+    ORDER BY modified_date DESC
+    LIMIT ?
+"""
+
+# iter_pending_files で1回に読み込む行数
+PENDING_FETCH_ROWS = 1000
+
+# 計算済みドキュメントIDの一括取得（{placeholders} は (?, ?, ?) の並び）
+SELECT_CACHED_DOC_IDS_SQL = """
+    SELECT file_id, doc_id FROM processed_files
+    WHERE doc_id IS NOT NULL
+      AND (file_id, modified_date, file_size) IN (VALUES {placeholders})
+"""
+
+# 処理統計カウンタ（processed_files へのトリガーで更新し、get_statistics を集計スキャンなしで返す）
+# count_<status> は状態別件数、sum_* / count_duration は status='success' 行の合計
+# （最終処理日時は数値ではないため stats_timestamps に別に保持）
+STATS_COUNTER_KEYS = (
+    'total_files', 'count_pending', 'count_processing', 'count_success', 'count_failed',
+    'sum_slides', 'sum_duration', 'count_duration',
+)
+
+# 既存データからのカウンタ再構築
+REBUILD_STATS_SQL = """
+    INSERT OR REPLACE INTO stats_counters (key, value)
+    SELECT 'total_files', COUNT(*) FROM processed_files
+    UNION ALL
+    SELECT 'count_' || status, COUNT(*) FROM processed_files
+    WHERE status IS NOT NULL GROUP BY status
+    UNION ALL
+    SELECT 'sum_slides', COALESCE(SUM(slide_count), 0)
+    FROM processed_files WHERE status = 'success'
+    UNION ALL
+    SELECT 'sum_duration', COALESCE(SUM(processing_duration_seconds), 0)
+    FROM processed_files WHERE status = 'success'
+    UNION ALL
+    SELECT 'count_duration', COUNT(processing_duration_seconds)
+    FROM processed_files WHERE status = 'success'
+"""
+
+# 日時の比較は文字列の形式差（'T' / ' ' 区切り等）に依存しないよう julianday() で行う
+REBUILD_STATS_TIMESTAMPS_SQL = """
+    INSERT OR REPLACE INTO stats_timestamps (key, value)
+    SELECT 'last_processed', (
+        SELECT processed_at FROM processed_files
+        WHERE status = 'success' AND processed_at IS NOT NULL
+        ORDER BY julianday(processed_at) DESC
+        LIMIT 1
+    )
+"""
+
+# 行 {row}（NEW / OLD）の寄与をカウンタに加算（sign=+）/ 減算（sign=-）するトリガー本体
+# ※ トリガー内の OR IGNORE は外側の文の衝突解決で上書きされるため NOT EXISTS で未登録キーを追加
+STATS_APPLY_SQL = """
+    INSERT INTO stats_counters (key, value)
+    SELECT 'count_' || {row}.status, 0
+    WHERE NOT EXISTS (SELECT 1 FROM stats_counters WHERE key = 'count_' || {row}.status);
+    UPDATE stats_counters SET value = value {sign} 1
+    WHERE key IN ('total_files', 'count_' || {row}.status);
+    UPDATE stats_counters SET value = value {sign} CASE key
+        WHEN 'sum_slides' THEN COALESCE({row}.slide_count, 0)
+        WHEN 'sum_duration' THEN COALESCE({row}.processing_duration_seconds, 0)
+        ELSE ({row}.processing_duration_seconds IS NOT NULL)
+    END
+    WHERE {row}.status = 'success'
+      AND key IN ('sum_slides', 'sum_duration', 'count_duration');
+"""
+
+# 最終処理日時は単調増加として扱い、success になった行の processed_at で更新
+STATS_LAST_PROCESSED_SQL = """
+    UPDATE stats_timestamps SET value = NEW.processed_at
+    WHERE key = 'last_processed'
+      AND NEW.status = 'success' AND NEW.processed_at IS NOT NULL
+      AND (value IS NULL OR julianday(value) < julianday(NEW.processed_at));
+"""
+
+# この回数コミットする毎にWALをチェックポイント
+WAL_CHECKPOINT_COMMITS = 256
+
+# 処理ログはバッファに溜めてこの件数毎にまとめて書き込む
+LOG_BATCH_SIZE = 64
+
+INSERT_LOG_SQL = """
+    INSERT INTO processing_logs (file_id, event_type, message)
+    VALUES (?, ?, ?)
+"""
+
+# update_status でバインド変数の代わりにSQL式で設定するカラム
+# （adapt_timestamp と同じ 'YYYY-MM-DD HH:MM:SS.SSS+00:00' 形式のUTC現在時刻）
+UPDATE_STATUS_VALUES = {
+    'processed_at': "strftime('%Y-%m-%d %H:%M:%f+00:00', 'now')",
+}
+
+# update_status のUPDATE文キャッシュ（更新カラムの組み合わせ -> SQL）
+UPDATE_STATUS_SQL_CACHE: Dict[tuple, str] = {}
+
+# 単一ファイル登録用UPSERT（SELECTを省略し1文で登録/更新を判定）
+# 判定は _classify_file と同じ: 更新日時が新しい場合は UPDATE_MODIFIED_SQL と同じ内容で再処理待ちに戻し、
+# 前回失敗した場合は行を変更せずに処理対象とする（どちらでもなければ更新されず行を返さない）
+# RETURNING（SQLite 3.35以降）で登録後の状態を同じ文で受け取る
+UPSERT_FILE_SQL = """
+    INSERT INTO processed_files (
+        file_id, file_name, sharepoint_url, sharepoint_path,
+        site_id, drive_id, modified_date, file_size, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+    ON CONFLICT(file_id) DO UPDATE SET
+        modified_date = CASE WHEN {newer} THEN excluded.modified_date ELSE modified_date END,
+        file_size = CASE WHEN {newer} THEN excluded.file_size ELSE file_size END,
+        doc_id = CASE WHEN {newer} THEN NULL ELSE doc_id END,
+        status = CASE WHEN {newer} THEN 'pending' ELSE status END,
+        error_message = CASE WHEN {newer} THEN NULL ELSE error_message END
+    WHERE {newer} OR processed_files.status = 'failed'
+    RETURNING status
+""".format(newer="julianday(excluded.modified_date) > julianday(processed_files.modified_date)")
+
+
 class ProcessedFilesDB:
     """処理済みファイルの状態管理データベース"""
 
@@ -23,48 +255,115 @@ class ProcessedFilesDB:
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.conn: Optional[sqlite3.Connection] = None
+
+        # スレッド間で接続を共有するため、書き込み（〜コミット）を直列化
+        # （bulk()内から各書き込みメソッドを呼べるよう再入可能なロック）
+        self._write_lock = threading.RLock()
+        self._in_bulk = False
+        self._commits_since_ckpt = 0
+
+        # 未書き込みの処理ログ（file_id, event_type, message）
+        self._log_buffer: List[Tuple[str, str, str]] = []
+
+        # 読み取り専用接続（スレッド毎に1つ）。WALでは書き込み中も待たずに読める
+        # ※ bulk()内の未コミットの書き込みは読み取り接続からは見えない
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
         self._initialize_db()
 
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """
+        PRAGMAを設定した接続を作成（接続毎に必要な設定のため、新しい接続は必ずここで作成）
+
+        Args:
+            readonly: True の場合、読み取り専用で接続
+
+        Returns:
+            sqlite3.Connection
+        """
+        if readonly:
+            uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(
+                uri, uri=True, check_same_thread=False,
+                detect_types=sqlite3.PARSE_DECLTYPES
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path, check_same_thread=False,
+                detect_types=sqlite3.PARSE_DECLTYPES
+            )
+        conn.row_factory = sqlite3.Row  # 辞書形式で結果を取得
+
+        if not readonly:
+            # ページサイズは新規DBでのみ有効（WAL切り替えで最初のページが書かれる前に指定）
+            # 既存DBでは何もしない
+            conn.execute("PRAGMA page_size=8192")
+
+            # WALモード: コミット毎のfsyncを削減し、読み取りと書き込みを並行可能に
+            # （データベースファイルに記録されるため、読み取り専用接続でも有効）
+            journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if journal_mode.lower() != 'wal':
+                # ネットワークドライブ等ではWALが使えず、元のモードのまま動作する
+                logger.warning(f"WALモードを有効化できません（journal_mode={journal_mode}）")
+            # WALが1000ページを超えたらコミット時に自動チェックポイント（既定値を明示）
+            conn.execute("PRAGMA wal_autocheckpoint=1000")
+
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-65536")  # 64MB
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # 256MB: 読み取りをページキャッシュから直接（read()呼び出しを省略）
+        # ※ 指定は上限値で、マッピングできない環境では通常の読み取りで動作する
+        conn.execute("PRAGMA mmap_size=268435456")
+        # 他プロセス（統計確認スクリプト等）が書き込み中でも即エラーにせず最大30秒待機
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
     def _initialize_db(self):
         """データベーステーブルを初期化"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row  # 辞書形式で結果を取得
+        self.conn = self._connect()
 
         cursor = self.conn.cursor()
 
+        schema_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
         # 処理済みファイルテーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS processed_files (
-                file_id TEXT PRIMARY KEY,
-                file_name TEXT NOT NULL,
-                sharepoint_url TEXT,
-                sharepoint_path TEXT,
-                site_id TEXT,
-                drive_id TEXT,
-                modified_date TIMESTAMP,
-                file_size INTEGER,
-                doc_id TEXT,
-                processed_at TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                error_message TEXT,
-                slide_count INTEGER,
-                processing_duration_seconds REAL
-            )
-        """)
+        cursor.execute(CREATE_PROCESSED_FILES_SQL.format(table='processed_files'))
+        if schema_version < 2:
+            self._migrate_v2(cursor)
 
         # インデックス作成
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_modified
             ON processed_files(modified_date)
         """)
+        # statusでの絞り込みは pending / failed のみのため、全値を持つ idx_status は
+        # 部分インデックスに置き換える（既存DBからは削除）
+        cursor.execute("DROP INDEX IF EXISTS idx_status")
+        # get_pending_files の取得カラムを全て含むカバリングインデックス（テーブル本体を読まない）
+        # ※ SQLiteはWHERE句のカラムもインデックスに含まれないとカバリングと判定しないため末尾にstatusを持つ
+        cursor.execute("DROP INDEX IF EXISTS idx_pending")
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_status
-            ON processed_files(status)
+            CREATE INDEX IF NOT EXISTS idx_pending_cov
+            ON processed_files(modified_date DESC, file_id, file_name,
+                               sharepoint_url, site_id, drive_id, file_size, status)
+            WHERE status = 'pending'
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_failed
+            ON processed_files(processed_at DESC)
+            WHERE status = 'failed'
         """)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_doc_id
             ON processed_files(doc_id)
         """)
+        # 未完了ファイルのみの部分インデックス（大半を占めるsuccess行を含まず小さい）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_unfinished
+            ON processed_files(status)
+            WHERE status IN ('pending', 'processing', 'failed')
+        """)
 
         # 処理ログテーブル
         cursor.execute("""
@@ -77,101 +376,435 @@ class ProcessedFilesDB:
                 FOREIGN KEY (file_id) REFERENCES processed_files(file_id)
             )
         """)
+        # ファイル毎のログ参照・結合用（外部キーは foreign_keys=OFF のまま記録上の宣言のみとし、
+        # 挿入毎の親テーブル探索は行わない）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_logs_file
+            ON processing_logs(file_id, timestamp)
+        """)
+
+        # 差分同期トークンテーブル（ドライブ毎のGraph deltaリンク）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_tokens (
+                drive_id TEXT PRIMARY KEY,
+                delta_link TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # サイトID・ドライブIDのキャッシュテーブル（実行毎のGraph問い合わせを省略）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS site_cache (
+                site_url TEXT PRIMARY KEY,
+                site_id TEXT NOT NULL,
+                drive_id TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # 処理統計カウンタテーブル（新規作成時は既存データから構築）
+        stats_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'"
+        ).fetchone()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                key TEXT PRIMARY KEY,
+                value REAL
+            )
+        """)
+        if not stats_exists:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO stats_counters (key, value) VALUES (?, 0)",
+                [(key,) for key in STATS_COUNTER_KEYS]
+            )
+            cursor.execute(REBUILD_STATS_SQL)
+
+        # 最終処理日時等の統計日時（TIMESTAMP型で保持し、読み取り時はdatetimeに変換）
+        timestamps_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_timestamps'"
+        ).fetchone()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_timestamps (
+                key TEXT PRIMARY KEY,
+                value TIMESTAMP
+            )
+        """)
+        if not timestamps_exists:
+            # 旧バージョンは stats_counters（REAL列）に保持していたため移し替える
+            cursor.execute("DELETE FROM stats_counters WHERE key = 'last_processed'")
+            cursor.execute(REBUILD_STATS_TIMESTAMPS_SQL)
+
+        # 登録・状態更新・削除の全経路でカウンタを同一トランザクション内で更新
+        # （定義の変更を既存DBにも反映するため毎回作り直す。他プロセスの書き込みが
+        #   トリガーなしで実行されないよう、削除から再作成までを1トランザクションで行う）
+        if not self.conn.in_transaction:
+            cursor.execute("BEGIN")
+        for trigger in ('trg_stats_insert', 'trg_stats_update', 'trg_stats_delete'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"""
+            CREATE TRIGGER trg_stats_insert
+            AFTER INSERT ON processed_files
+            BEGIN
+                {STATS_APPLY_SQL.format(row='NEW', sign='+')}
+                {STATS_LAST_PROCESSED_SQL}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_stats_update
+            AFTER UPDATE OF status, slide_count, processing_duration_seconds, processed_at
+            ON processed_files
+            BEGIN
+                {STATS_APPLY_SQL.format(row='OLD', sign='-')}
+                {STATS_APPLY_SQL.format(row='NEW', sign='+')}
+                {STATS_LAST_PROCESSED_SQL}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_stats_delete
+            AFTER DELETE ON processed_files
+            BEGIN
+                {STATS_APPLY_SQL.format(row='OLD', sign='-')}
+            END
+        """)
+
+        if schema_version < 3:
+            self._migrate_v3(cursor)
 
         self.conn.commit()
         logger.info(f"データベース初期化完了: {self.db_path}")
 
-    def add_or_update_file(self, file_info: Dict) -> bool:
+    def _migrate_v2(self, cursor: sqlite3.Cursor):
         """
-        ファイル情報を追加または更新
+        旧形式（rowidテーブル）の processed_files を WITHOUT ROWID テーブルに1トランザクションで作り直す
+        インデックスとトリガーはテーブルと共に削除され、_initialize_db の続きで再作成される
 
         Args:
-            file_info: SharePointファイル情報
+            cursor: 書き込み接続のカーソル
+        """
+        row = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'processed_files'"
+        ).fetchone()
+        if 'WITHOUT ROWID' not in row[0].upper():
+            logger.info("processed_files を WITHOUT ROWID テーブルに移行します")
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(CREATE_PROCESSED_FILES_SQL.format(table='processed_files_v2'))
+                cursor.execute("""
+                    INSERT INTO processed_files_v2
+                    SELECT * FROM processed_files WHERE file_id IS NOT NULL
+                """)
+                cursor.execute("DROP TABLE processed_files")
+                cursor.execute("ALTER TABLE processed_files_v2 RENAME TO processed_files")
+                cursor.execute("PRAGMA user_version = 2")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        else:
+            cursor.execute("PRAGMA user_version = 2")
+
+    def _migrate_v3(self, cursor: sqlite3.Cursor):
+        """
+        旧形式の processed_at（'YYYY-MM-DDTHH:MM:SS.ffffff' 等）を
+        'YYYY-MM-DD HH:MM:SS.SSS+00:00' 形式（UTC）に統一
+        文字列のまま並べ替える get_failed_files 等の順序を正しくするため
+        （_initialize_db のトランザクション内、トリガー再作成後に実行）
 
-        Returns:
-            True: 新規追加または更新が必要, False: 既存で変更なし
+        Args:
+            cursor: 書き込み接続のカーソル
         """
-        cursor = self.conn.cursor()
+        cursor.execute("""
+            UPDATE processed_files
+            SET processed_at = strftime('%Y-%m-%d %H:%M:%f+00:00', processed_at)
+            WHERE processed_at IS NOT NULL AND processed_at NOT LIKE '%+00:00'
+        """)
+        if cursor.rowcount:
+            logger.info(f"processed_at の形式を統一しました: {cursor.rowcount}件")
+        cursor.execute(REBUILD_STATS_TIMESTAMPS_SQL)
+        cursor.execute("PRAGMA user_version = 3")
 
-        # 既存レコードを確認
-        cursor.execute(
-            "SELECT modified_date, status FROM processed_files WHERE file_id = ?",
-            (file_info['id'],)
-        )
-        row = cursor.fetchone()
+    @contextmanager
+    def _transaction(self):
+        """
+        書き込みトランザクション（正常終了でコミット、例外時はロールバック）
+        bulk()内では外側のトランザクションに含め、ここではコミットしない
+        """
+        with self._write_lock:
+            if self._in_bulk:
+                yield
+            else:
+                with self.conn:
+                    yield
+                self._after_commit()
+
+    def _after_commit(self):
+        """コミット回数を数え、一定回数毎にWALをチェックポイント"""
+        self._commits_since_ckpt += 1
+        if self._commits_since_ckpt >= WAL_CHECKPOINT_COMMITS:
+            # 自動実行は読み取り・書き込みを待たない PASSIVE で行う
+            self.checkpoint('PASSIVE')
+
+    def checkpoint(self, mode: str = 'TRUNCATE'):
+        """
+        WALの内容をデータベース本体に書き戻す
+        （長時間の同期でWALが肥大化し、読み取りが遅くなるのを防ぐ）
+
+        Args:
+            mode: チェックポイントモード
+                'TRUNCATE': 読み取り完了を待ってWALファイルを切り詰める（明示的な呼び出し・クローズ時）
+                'PASSIVE': 待たずに書き戻せる分だけ書き戻す（自動実行時）
+        """
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"不正なチェックポイントモード: {mode}")
+
+        with self._write_lock:
+            busy, _, _ = self.conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            if busy:
+                logger.warning("WALチェックポイントを完了できません（読み取り中の接続あり）")
+            self._commits_since_ckpt = 0
+
+    def optimize(self):
+        """クエリプランナーの統計情報を更新（PRAGMA optimize、必要なテーブルのみ解析）"""
+        with self._write_lock:
+            self.conn.execute("PRAGMA optimize")
+
+    @contextmanager
+    def bulk(self):
+        """
+        複数の書き込みを1トランザクションにまとめる（fsyncは終了時の1回のみ）
+
+        使用例:
+            with db.bulk():
+                for file_id in file_ids:
+                    db.update_status(file_id, 'pending')
+                    db.add_log(file_id, 'reset', '再処理対象に設定')
+        """
+        with self._write_lock:
+            self._in_bulk = True
+            try:
+                with self.conn:
+                    yield self
+                    # バッファ中のログも同じトランザクションでコミット（クリアはコミット成功後）
+                    self.conn.executemany(INSERT_LOG_SQL, self._log_buffer)
+                self._log_buffer.clear()
+            except BaseException:
+                self._in_bulk = False
+                # ロールバックされてもエラー調査用のログは残すため、別トランザクションで書き込む
+                try:
+                    self.flush_logs()
+                except sqlite3.Error as e:
+                    logger.warning(f"ロールバック後の処理ログ書き込みに失敗: {e}")
+                raise
+            finally:
+                self._in_bulk = False
+            # 一括書き込み後はWALが大きくなっているためチェックポイント（書き込みを止めない PASSIVE）
+            self.checkpoint('PASSIVE')
+
+    @staticmethod
+    def _classify_file(row: Optional[tuple], file_info: 'FileInfo') -> Optional[str]:
+        """
+        既存レコードと比較してファイルの変更種別を判定
 
+        Args:
+            row: 既存レコードのタプル（modified_date, status）。未登録の場合はNone
+            file_info: SharePointファイル情報
+
+        Returns:
+            'new': 新規, 'modified': 更新あり, 'failed': 前回失敗, None: 変更なし
+        """
         # 新規ファイル
         if row is None:
-            cursor.execute("""
-                INSERT INTO processed_files (
-                    file_id, file_name, sharepoint_url, sharepoint_path,
-                    site_id, drive_id, modified_date, file_size, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
-            """, (
-                file_info['id'],
-                file_info['name'],
-                file_info.get('web_url'),
-                file_info.get('path'),
-                file_info.get('site_id'),
-                file_info.get('drive_id'),
-                file_info['modified'],
-                file_info['size']
-            ))
-            self.conn.commit()
-            logger.info(f"新規ファイル追加: {file_info['name']}")
-            return True
-
-        # 既存ファイルが更新されている場合
-        existing_modified = datetime.fromisoformat(row['modified_date'].replace('Z', '+00:00'))
-        new_modified = file_info['modified']
-
-        if new_modified > existing_modified:
-            cursor.execute("""
-                UPDATE processed_files
-                SET modified_date = ?,
-                    file_size = ?,
-                    status = 'pending',
-                    error_message = NULL
-                WHERE file_id = ?
-            """, (
-                file_info['modified'],
-                file_info['size'],
-                file_info['id']
-            ))
-            self.conn.commit()
-            logger.info(f"ファイル更新検出: {file_info['name']}")
-            return True
+            logger.info(f"新規ファイル追加: {file_info.name}")
+            return 'new'
+
+        existing_modified_date, existing_status = row
+
+        # 既存ファイルが更新されている場合（modified_date は変換済みのdatetime）
+        if file_info.modified > existing_modified_date:
+            logger.info(f"ファイル更新検出: {file_info.name}")
+            return 'modified'
 
         # 処理失敗したファイルは再処理
-        if row['status'] == 'failed':
-            logger.info(f"失敗ファイルを再処理対象に: {file_info['name']}")
-            return True
+        if existing_status == 'failed':
+            logger.info(f"失敗ファイルを再処理対象に: {file_info.name}")
+            return 'failed'
 
         # 変更なし
-        return False
+        return None
+
+    @staticmethod
+    def _insert_params(file_info: 'FileInfo') -> tuple:
+        """INSERT用パラメータを生成"""
+        # FileInfo の先頭8フィールドはINSERTのカラム順と同じため、スライスでそのまま渡す
+        return file_info[:INSERT_FIELD_COUNT]
+
+    @staticmethod
+    def _update_params(file_info: 'FileInfo') -> tuple:
+        """UPDATE用パラメータを生成"""
+        return (
+            file_info.modified,
+            file_info.size,
+            file_info.id
+        )
+
+    def add_or_update_file(self, file_info: 'FileInfo') -> bool:
+        """
+        ファイル情報を追加または更新（UPSERT 1文で実行）
+        前回失敗したファイルは add_or_update_files と同様、行を変更せずに処理対象とする
+
+        Args:
+            file_info: SharePointファイル情報
+
+        Returns:
+            True: 新規追加または更新が必要, False: 既存で変更なし
+        """
+        with self._transaction():
+            # 文の実行を完了させてからコミットするため fetchall で受け取る（対象外なら空）
+            rows = self.conn.execute(UPSERT_FILE_SQL, self._insert_params(file_info)).fetchall()
+
+        if not rows:
+            return False
+
+        if rows[0]['status'] == 'failed':
+            logger.info(f"失敗ファイルを再処理対象に: {file_info.name}")
+        else:
+            logger.info(f"処理対象に登録: {file_info.name}")
+        return True
 
-    def get_pending_files(self, limit: Optional[int] = None) -> List[Dict]:
+    def add_or_update_files(
+        self,
+        file_infos: List['FileInfo'],
+        delta_links: Optional[Dict[str, str]] = None
+    ) -> Set[str]:
+        """
+        複数のファイル情報を1トランザクションで追加または更新
+
+        Args:
+            file_infos: SharePointファイル情報のリスト
+            delta_links: ドライブID -> 次回用deltaリンク（登録と同じトランザクションで保存し、
+                登録に失敗した変更分をdeltaリンクだけ進めて取りこぼすことを防ぐ）
+
+        Returns:
+            新規追加または更新が必要なファイルIDの集合
+        """
+        inserts = []
+        updates = []
+        changed = set()
+
+        with self._transaction():
+            cursor = self.conn.cursor()
+
+            # 対象ファイルの既存レコードをIN句でまとめて読み込み、ファイル毎のSELECTを省略
+            # （差分同期で対象が少ない場合もテーブル全体は読まない）
+            # 件数が多いため、sqlite3.Rowを生成しないタプル行で取得
+            cursor.row_factory = None
+            existing = {}
+            for start in range(0, len(file_infos), SQL_BATCH_ROWS):
+                chunk = file_infos[start:start + SQL_BATCH_ROWS]
+                placeholders = ', '.join(['?'] * len(chunk))
+                cursor.execute(
+                    SELECT_EXISTING_SQL.format(placeholders=placeholders),
+                    [f.id for f in chunk]
+                )
+                existing.update(
+                    (file_id, (modified, status)) for file_id, modified, status in cursor
+                )
+
+            for file_info in file_infos:
+                change = self._classify_file(existing.get(file_info.id), file_info)
+                if change is None:
+                    continue
+
+                changed.add(file_info.id)
+                if change == 'new':
+                    inserts.append(self._insert_params(file_info))
+                elif change == 'modified':
+                    updates.append(self._update_params(file_info))
+
+            # コミット（fsync）はまとめて1回
+            cursor.executemany(INSERT_FILE_SQL, inserts)
+            cursor.executemany(UPDATE_MODIFIED_SQL, updates)
+            if delta_links:
+                cursor.executemany(SAVE_DELTA_LINK_SQL, delta_links.items())
+
+        logger.info(
+            f"ファイル一括登録: 新規={len(inserts)}, 更新={len(updates)}, "
+            f"処理対象={len(changed)}/{len(file_infos)}"
+        )
+        return changed
+
+    def get_cached_doc_ids(self, file_infos: List['FileInfo']) -> Dict[str, str]:
+        """
+        更新日時とサイズが一致するファイルの計算済みドキュメントIDを一括取得
+
+        Args:
+            file_infos: ファイル情報のリスト（id, modified, size）
+
+        Returns:
+            ファイルID -> ドキュメントID の辞書（未計算または変更ありのファイルは含まない）
+        """
+        cursor = self._reader().cursor()
+        cursor.row_factory = None  # タプル行（file_id, doc_id）をそのまま辞書化
+        doc_ids = {}
+
+        # SQLiteのバインド変数上限を超えないよう分割して問い合わせ
+        for start in range(0, len(file_infos), SQL_BATCH_ROWS):
+            chunk = file_infos[start:start + SQL_BATCH_ROWS]
+            placeholders = ', '.join(['(?, ?, ?)'] * len(chunk))
+            params = [
+                value
+                for f in chunk
+                for value in (f.id, f.modified, f.size)
+            ]
+            cursor.execute(SELECT_CACHED_DOC_IDS_SQL.format(placeholders=placeholders), params)
+            doc_ids.update(cursor)
+
+        return doc_ids
+
+    def get_pending_files(self, limit: Optional[int] = None) -> List[sqlite3.Row]:
         """
         処理待ちファイルを取得
 
+        Args:
+            limit: 取得件数制限
+
+        Returns:
+            処理待ちファイルのリスト（sqlite3.Row、キーでアクセス可能）
+        """
+        cursor = self._reader().cursor()
+
+        cursor.execute(SELECT_PENDING_SQL, (limit if limit else -1,))
+        return cursor.fetchall()
+
+    def get_pending_files_as_dicts(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        処理待ちファイルを辞書のリストで取得（JSON出力など通常の辞書が必要な場合用）
+
         Args:
             limit: 取得件数制限
 
         Returns:
             処理待ちファイルのリスト
         """
-        cursor = self.conn.cursor()
+        return [dict(row) for row in self.get_pending_files(limit)]
 
-        query = """
-            SELECT * FROM processed_files
-            WHERE status = 'pending'
-            ORDER BY modified_date DESC
+    def iter_pending_files(self, batch_size: int = PENDING_FETCH_ROWS) -> Iterator[sqlite3.Row]:
         """
-        if limit:
-            query += f" LIMIT {limit}"
+        処理待ちファイルを全件メモリに載せずに順次取得
 
-        cursor.execute(query)
-        return [dict(row) for row in cursor.fetchall()]
+        Args:
+            batch_size: 1回に読み込む行数
+
+        Yields:
+            処理待ちファイル（sqlite3.Row）
+        """
+        cursor = self._reader().cursor()
+        cursor.execute(SELECT_PENDING_SQL, (-1,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
 
     def update_status(
         self,
@@ -187,49 +820,53 @@ class ProcessedFilesDB:
 
         Args:
             file_id: ファイルID
-            status: 状態 ('processing', 'success', 'failed')
+            status: 状態 ('processing', 'success', 'failed', 'deleted')
             error_message: エラーメッセージ（失敗時）
             doc_id: ドキュメントID（成功時）
             slide_count: スライド数（成功時）
             duration: 処理時間（秒）
         """
-        cursor = self.conn.cursor()
-
-        update_fields = ["status = ?"]
+        update_fields = ["status"]
         params = [status]
 
         if error_message:
-            update_fields.append("error_message = ?")
+            update_fields.append("error_message")
             params.append(error_message)
 
         if doc_id:
-            update_fields.append("doc_id = ?")
+            update_fields.append("doc_id")
             params.append(doc_id)
 
         if slide_count is not None:
-            update_fields.append("slide_count = ?")
+            update_fields.append("slide_count")
             params.append(slide_count)
 
         if duration is not None:
-            update_fields.append("processing_duration_seconds = ?")
+            update_fields.append("processing_duration_seconds")
             params.append(duration)
 
+        # 処理日時はSQL側で付与（パラメータなし）
         if status in ('success', 'failed'):
-            update_fields.append("processed_at = ?")
-            params.append(datetime.utcnow().isoformat())
+            update_fields.append("processed_at")
 
         params.append(file_id)
 
-        query = f"""
-            UPDATE processed_files
-            SET {', '.join(update_fields)}
-            WHERE file_id = ?
-        """
+        # 更新カラムの組み合わせ毎にSQLを1度だけ組み立てて再利用
+        # （SQL文字列が同一ならsqlite3のステートメントキャッシュで再パースも省略される）
+        key = tuple(update_fields)
+        query = UPDATE_STATUS_SQL_CACHE.get(key)
+        if query is None:
+            query = f"""
+                UPDATE processed_files
+                SET {', '.join(f"{field} = {UPDATE_STATUS_VALUES.get(field, '?')}" for field in update_fields)}
+                WHERE file_id = ?
+            """
+            UPDATE_STATUS_SQL_CACHE[key] = query
 
-        cursor.execute(query, params)
-        self.conn.commit()
+        with self._transaction():
+            self.conn.execute(query, params)
 
-        logger.info(f"状態更新: {file_id} -> {status}")
+        logger.debug("状態更新: %s -> %s", file_id, status)
 
     def add_log(self, file_id: str, event_type: str, message: str):
         """
@@ -240,89 +877,222 @@ class ProcessedFilesDB:
             event_type: イベントタイプ ('download', 'extract', 'render', 'embed', 'index')
             message: ログメッセージ
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO processing_logs (file_id, event_type, message)
-            VALUES (?, ?, ?)
-        """, (file_id, event_type, message))
-        self.conn.commit()
+        # 1件毎のコミットを避け、LOG_BATCH_SIZE 件溜まったらまとめて書き込む
+        with self._write_lock:
+            self._log_buffer.append((file_id, event_type, message))
+            # bulk() 中はロールバック時に失われないよう、終了時まで溜めておく
+            if len(self._log_buffer) >= LOG_BATCH_SIZE and not self._in_bulk:
+                self.flush_logs()
+
+    def flush_logs(self):
+        """バッファ中の処理ログを1トランザクションで書き込む（bulk() 中は終了時まで遅延）"""
+        with self._write_lock:
+            if not self._log_buffer or self._in_bulk:
+                return
+            with self._transaction():
+                self.conn.executemany(INSERT_LOG_SQL, self._log_buffer)
+            self._log_buffer.clear()
 
     def get_statistics(self) -> Dict:
         """
         処理統計を取得
 
+        トリガーで維持している stats_counters / stats_timestamps を読むだけなので、ファイル数に依存せず一定時間で返る
+
         Returns:
             統計情報の辞書
         """
-        cursor = self.conn.cursor()
+        cursor = self._reader().cursor()
+        cursor.execute("SELECT key, value FROM stats_counters")
+        counters = {row['key']: row['value'] for row in cursor.fetchall()}
 
         stats = {}
 
-        # 状態別件数
-        cursor.execute("""
-            SELECT status, COUNT(*) as count
-            FROM processed_files
-            GROUP BY status
-        """)
-        stats['by_status'] = {row['status']: row['count'] for row in cursor.fetchall()}
-
-        # 総ファイル数
-        cursor.execute("SELECT COUNT(*) as total FROM processed_files")
-        stats['total_files'] = cursor.fetchone()['total']
+        # 状態別件数（0件の状態は含めない）
+        stats['by_status'] = {
+            key[len('count_'):]: int(value)
+            for key, value in counters.items()
+            if key.startswith('count_') and key != 'count_duration' and value
+        }
 
-        # 総スライド数
-        cursor.execute("SELECT SUM(slide_count) as total FROM processed_files WHERE status = 'success'")
-        result = cursor.fetchone()
-        stats['total_slides'] = result['total'] if result['total'] else 0
+        stats['total_files'] = int(counters.get('total_files') or 0)
+        stats['total_slides'] = int(counters.get('sum_slides') or 0)
 
         # 平均処理時間
-        cursor.execute("""
-            SELECT AVG(processing_duration_seconds) as avg_duration
-            FROM processed_files
-            WHERE status = 'success' AND processing_duration_seconds IS NOT NULL
-        """)
-        result = cursor.fetchone()
-        stats['avg_processing_seconds'] = result['avg_duration'] if result['avg_duration'] else 0
+        count_duration = counters.get('count_duration') or 0
+        stats['avg_processing_seconds'] = (
+            counters['sum_duration'] / count_duration if count_duration else 0
+        )
 
         # 最終処理日時
-        cursor.execute("""
-            SELECT MAX(processed_at) as last_processed
-            FROM processed_files
-            WHERE status = 'success'
-        """)
-        result = cursor.fetchone()
-        stats['last_processed'] = result['last_processed']
+        row = cursor.execute(
+            "SELECT value FROM stats_timestamps WHERE key = 'last_processed'"
+        ).fetchone()
+        stats['last_processed'] = row['value'] if row else None
 
         return stats
 
-    def get_failed_files(self) -> List[Dict]:
-        """失敗したファイルのリストを取得"""
-        cursor = self.conn.cursor()
+    def get_failed_files(self) -> List[sqlite3.Row]:
+        """失敗したファイルのリストを取得（sqlite3.Row、キーでアクセス可能）"""
+        cursor = self._reader().cursor()
         cursor.execute("""
             SELECT file_id, file_name, error_message, processed_at
             FROM processed_files
             WHERE status = 'failed'
             ORDER BY processed_at DESC
         """)
-        return [dict(row) for row in cursor.fetchall()]
+        return cursor.fetchall()
 
     def reset_failed_files(self):
         """失敗したファイルを再処理対象に設定"""
-        cursor = self.conn.cursor()
+        with self._transaction():
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                UPDATE processed_files
+                SET status = 'pending', error_message = NULL
+                WHERE status = 'failed'
+            """)
+            affected = cursor.rowcount
+        logger.info(f"{affected}件の失敗ファイルを再処理対象に設定")
+        return affected
+
+    def get_delta_link(self, drive_id: str) -> Optional[str]:
+        """
+        前回保存したdeltaリンクを取得
+
+        Args:
+            drive_id: ドライブID
+
+        Returns:
+            deltaリンク（未保存の場合はNone）
+        """
+        row = self._reader().execute(
+            "SELECT delta_link FROM sync_tokens WHERE drive_id = ?",
+            (drive_id,)
+        ).fetchone()
+        return row['delta_link'] if row else None
+
+    def save_delta_link(self, drive_id: str, delta_link: str):
+        """
+        次回の差分同期用deltaリンクを保存
+
+        Args:
+            drive_id: ドライブID
+            delta_link: deltaリンク
+        """
+        with self._transaction():
+            self.conn.execute(SAVE_DELTA_LINK_SQL, (drive_id, delta_link))
+
+    def get_cached_site(self, site_url: str, max_age_hours: float) -> Optional[tuple]:
+        """
+        キャッシュ済みのサイトID・ドライブIDを取得
+
+        Args:
+            site_url: SharePointサイトURL
+            max_age_hours: キャッシュの有効期間（時間）
+
+        Returns:
+            (サイトID, ドライブID)（未キャッシュまたは期限切れの場合はNone）
+        """
+        row = self._reader().execute("""
+            SELECT site_id, drive_id FROM site_cache
+            WHERE site_url = ? AND updated_at >= datetime('now', ?)
+        """, (site_url, f"-{max_age_hours} hours")).fetchone()
+        return (row['site_id'], row['drive_id']) if row else None
+
+    def save_site(self, site_url: str, site_id: str, drive_id: str):
+        """
+        サイトID・ドライブIDをキャッシュに保存
+
+        Args:
+            site_url: SharePointサイトURL
+            site_id: サイトID
+            drive_id: ドライブID
+        """
+        with self._transaction():
+            self.conn.execute("""
+                INSERT INTO site_cache (site_url, site_id, drive_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(site_url) DO UPDATE SET
+                    site_id = excluded.site_id,
+                    drive_id = excluded.drive_id,
+                    updated_at = excluded.updated_at
+            """, (site_url, site_id, drive_id))
+
+    def delete_cached_site(self, site_url: str):
+        """
+        サイトのキャッシュを削除（スキャン失敗時に次回再取得させる）
+
+        Args:
+            site_url: SharePointサイトURL
+        """
+        with self._transaction():
+            self.conn.execute("DELETE FROM site_cache WHERE site_url = ?", (site_url,))
+
+    def get_unfinished_files(self) -> List[sqlite3.Row]:
+        """
+        未完了（処理待ち・処理中・失敗）のファイルを取得
+        差分同期で変更として返らなかった再処理対象を拾うために使用
+
+        Returns:
+            未完了ファイルのリスト（file_id, file_name, sharepoint_path, site_id, drive_id, status）
+        """
+        cursor = self._reader().cursor()
         cursor.execute("""
-            UPDATE processed_files
-            SET status = 'pending', error_message = NULL
-            WHERE status = 'failed'
+            SELECT file_id, file_name, sharepoint_path, site_id, drive_id, status
+            FROM processed_files
+            WHERE status IN ('pending', 'processing', 'failed')
         """)
-        affected = cursor.rowcount
-        self.conn.commit()
-        logger.info(f"{affected}件の失敗ファイルを再処理対象に設定")
+        return cursor.fetchall()
+
+    def reset_processing_files(self) -> int:
+        """
+        処理中のまま残ったファイル（前回実行の異常終了等）を処理待ちに戻す
+        パイプラインの実行開始時（処理中のファイルがない時点）に呼び出す
+
+        Returns:
+            処理待ちに戻した件数
+        """
+        with self._transaction():
+            cursor = self.conn.execute("""
+                UPDATE processed_files
+                SET status = 'pending'
+                WHERE status = 'processing'
+            """)
+            affected = cursor.rowcount
+        if affected:
+            logger.warning(f"処理中のまま残っていた{affected}件のファイルを処理待ちに戻しました")
         return affected
 
+    def _reader(self) -> sqlite3.Connection:
+        """
+        現在のスレッド用の読み取り専用接続を取得（初回のみ作成）
+
+        Returns:
+            sqlite3.Connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect(readonly=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
     def close(self):
         """データベース接続をクローズ"""
+        with self._readers_lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+
         if self.conn:
+            self.flush_logs()
+            self.optimize()
+            # 読み取り接続は閉じ済みのため、WALを切り詰めてから閉じる
+            self.checkpoint()
             self.conn.close()
+            self.conn = None
             logger.info("データベース接続クローズ")
 
     def __enter__(self):
@@ -332,6 +1102,72 @@ class ProcessedFilesDB:
         self.close()
 
 
+class AsyncProcessedFilesDB:
+    """
+    ProcessedFilesDBの非同期ラッパー
+    各操作をスレッドで実行し、SQLiteの書き込み（fsync）中もイベントループを止めない
+    """
+
+    def __init__(self, db: ProcessedFilesDB):
+        """
+        Args:
+            db: ラップする同期版データベース（スレッド間共有が可能な接続）
+        """
+        self.db = db
+
+    async def add_or_update_files(
+        self,
+        file_infos: List['FileInfo'],
+        delta_links: Optional[Dict[str, str]] = None
+    ) -> Set[str]:
+        """ProcessedFilesDB.add_or_update_files の非同期版"""
+        return await asyncio.to_thread(self.db.add_or_update_files, file_infos, delta_links)
+
+    async def get_cached_doc_ids(self, file_infos: List['FileInfo']) -> Dict[str, str]:
+        """ProcessedFilesDB.get_cached_doc_ids の非同期版"""
+        return await asyncio.to_thread(self.db.get_cached_doc_ids, file_infos)
+
+    async def update_status(self, file_id: str, status: str, *args, **kwargs):
+        """ProcessedFilesDB.update_status の非同期版"""
+        await asyncio.to_thread(self.db.update_status, file_id, status, *args, **kwargs)
+
+    async def add_log(self, file_id: str, event_type: str, message: str):
+        """ProcessedFilesDB.add_log の非同期版"""
+        await asyncio.to_thread(self.db.add_log, file_id, event_type, message)
+
+    async def flush_logs(self):
+        """ProcessedFilesDB.flush_logs の非同期版"""
+        await asyncio.to_thread(self.db.flush_logs)
+
+    async def get_delta_link(self, drive_id: str) -> Optional[str]:
+        """ProcessedFilesDB.get_delta_link の非同期版"""
+        return await asyncio.to_thread(self.db.get_delta_link, drive_id)
+
+    async def get_cached_site(self, site_url: str, max_age_hours: float) -> Optional[tuple]:
+        """ProcessedFilesDB.get_cached_site の非同期版"""
+        return await asyncio.to_thread(self.db.get_cached_site, site_url, max_age_hours)
+
+    async def save_site(self, site_url: str, site_id: str, drive_id: str):
+        """ProcessedFilesDB.save_site の非同期版"""
+        await asyncio.to_thread(self.db.save_site, site_url, site_id, drive_id)
+
+    async def delete_cached_site(self, site_url: str):
+        """ProcessedFilesDB.delete_cached_site の非同期版"""
+        await asyncio.to_thread(self.db.delete_cached_site, site_url)
+
+    async def get_unfinished_files(self) -> List[sqlite3.Row]:
+        """ProcessedFilesDB.get_unfinished_files の非同期版"""
+        return await asyncio.to_thread(self.db.get_unfinished_files)
+
+    async def reset_processing_files(self) -> int:
+        """ProcessedFilesDB.reset_processing_files の非同期版"""
+        return await asyncio.to_thread(self.db.reset_processing_files)
+
+    async def get_statistics(self) -> Dict:
+        """ProcessedFilesDB.get_statistics の非同期版"""
+        return await asyncio.to_thread(self.db.get_statistics)
+
+
 # ========== 使用例 ==========
 
 if __name__ == "__main__":
@@ -345,14 +1181,20 @@ if __name__ == "__main__":
     db = ProcessedFilesDB(Path("data/processed_files.db"))
 
     # テストデータ追加
-    test_file = {
-        'id': 'test-file-001',
-        'name': 'test_presentation.pptx',
-        'web_url': 'https://example.sharepoint.com/test.pptx',
-        'path': '/Design Guides/test.pptx',
-        'modified': datetime.utcnow(),
-        'size': 1024000
-    }
+    import sys
+    sys.path.append(str(Path(__file__).parent.parent))
+    from sharepoint_sync.sharepoint_client import FileInfo
+
+    test_file = FileInfo(
+        id='test-file-001',
+        name='test_presentation.pptx',
+        web_url='https://example.sharepoint.com/test.pptx',
+        path='/Design Guides/test.pptx',
+        site_id=None,
+        drive_id=None,
+        modified=datetime.utcnow(),
+        size=1024000
+    )
 
     # ファイル追加
     is_new = db.add_or_update_file(test_file)
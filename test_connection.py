@@ -7,6 +7,7 @@ import asyncio
 from pathlib import Path
 import yaml
 import sys
+from typing import Dict
 
 # パスを追加
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
@@ -14,6 +15,109 @@ sys.path.insert(0, str(Path(__file__).parent / 'src'))
 from sharepoint_sync.sharepoint_client import SharePointClient
 
 
+async def probe_site(client: SharePointClient, site_url: str) -> Dict:
+    """
+    1サイト分の接続確認（サイトID取得 → ドライブID取得 → PPTXファイル一覧取得）
+
+    Args:
+        client: SharePointクライアント
+        site_url: SharePointサイトURL
+
+    Returns:
+        確認結果の辞書（失敗時は失敗したステップ 'site' / 'drive' / 'files' と例外を含む）
+    """
+    result = {'site_url': site_url, 'failed_step': None, 'error': None}
+    step = 'site'
+    try:
+        result['site_id'] = await client.get_site_id(site_url)
+        step = 'drive'
+        result['drive_id'] = await client.get_drive_id(result['site_id'])
+        step = 'files'
+        result['files'] = await client.list_pptx_files(result['site_id'], result['drive_id'])
+    except Exception as e:
+        result['failed_step'] = step
+        result['error'] = e
+    return result
+
+
+def report_site(result: Dict) -> bool:
+    """
+    1サイト分の確認結果を表示
+
+    Args:
+        result: probe_site の戻り値
+
+    Returns:
+        すべてのステップが成功した場合True
+    """
+    failed_step = result['failed_step']
+    error = result['error']
+
+    print(f"接続先: {result['site_url']}\n")
+
+    # 1. サイトID取得
+    print("1. SharePointサイトへの接続...")
+    if failed_step == 'site':
+        print(f"   ❌ 接続失敗: {error}")
+        print("\n確認事項:")
+        print("  - tenant_id, client_id, client_secretが正しいか")
+        print("  - Azure ADアプリに権限が付与されているか")
+        print("  - 管理者の同意が完了しているか")
+        return False
+    print(f"   ✅ 接続成功")
+    print(f"   サイトID: {result['site_id']}\n")
+
+    # 2. ドライブID取得
+    print("2. ドキュメントライブラリへのアクセス...")
+    if failed_step == 'drive':
+        print(f"   ❌ アクセス失敗: {error}")
+        return False
+    print(f"   ✅ アクセス成功")
+    print(f"   ドライブID: {result['drive_id']}\n")
+
+    # 3. PPTXファイル一覧取得
+    print("3. PPTXファイルの検出...")
+    if failed_step == 'files':
+        print(f"   ❌ 検出失敗: {error}")
+        return False
+
+    files = result['files']
+    print(f"   ✅ 検出成功: {len(files)}件のPPTXファイル\n")
+
+    if len(files) == 0:
+        print("   ⚠️  PPTXファイルが見つかりませんでした")
+        print("   SharePointサイトにPPTXファイルをアップロードしてください\n")
+    else:
+        # 先頭10件の表示と総サイズの集計を1回のループで行う
+        print("   検出されたファイル（最初の10件）:")
+        total_size = 0
+        for i, f in enumerate(files, 1):
+            size = f.size
+            total_size += size
+            if i <= 10:
+                print(f"     {i}. {f.name} ({size / (1024 * 1024):.2f} MB)")
+
+        if len(files) > 10:
+            print(f"     ... 他 {len(files) - 10}件\n")
+        else:
+            print()
+
+        # 統計情報
+        avg_size = total_size / len(files)
+        print(f"   統計:")
+        print(f"     総ファイル数: {len(files)}")
+        print(f"     総サイズ: {total_size / (1024 * 1024):.2f} MB")
+        print(f"     平均ファイルサイズ: {avg_size / (1024 * 1024):.2f} MB\n")
+
+        # POC想定時間の見積もり
+        estimated_time = len(files) * 30  # 1ファイル30秒想定
+        print(f"   POC想定処理時間:")
+        print(f"     初回フルスキャン: 約{estimated_time // 60}分")
+        print(f"     （1ファイルあたり30秒で計算）\n")
+
+    return True
+
+
 async def test_connection():
     """SharePoint接続テスト"""
 
@@ -47,69 +151,17 @@ async def test_connection():
             print("❌ site_urlsが設定されていません")
             return False
 
-        site_url = site_urls[0]
-        print(f"接続先: {site_url}\n")
-
-        # 1. サイトID取得
-        print("1. SharePointサイトへの接続...")
-        try:
-            site_id = await client.get_site_id(site_url)
-            print(f"   ✅ 接続成功")
-            print(f"   サイトID: {site_id}\n")
-        except Exception as e:
-            print(f"   ❌ 接続失敗: {e}")
-            print("\n確認事項:")
-            print("  - tenant_id, client_id, client_secretが正しいか")
-            print("  - Azure ADアプリに権限が付与されているか")
-            print("  - 管理者の同意が完了しているか")
-            return False
+        # サイト毎の確認は独立しているため並行実行し、結果は順番に表示
+        # （クライアントのHTTP接続プールと認証トークンは全サイトで共有）
+        results = await asyncio.gather(*(probe_site(client, url) for url in site_urls))
 
-        # 2. ドライブID取得
-        print("2. ドキュメントライブラリへのアクセス...")
-        try:
-            drive_id = await client.get_drive_id(site_id)
-            print(f"   ✅ アクセス成功")
-            print(f"   ドライブID: {drive_id}\n")
-        except Exception as e:
-            print(f"   ❌ アクセス失敗: {e}")
-            return False
+        all_success = True
+        for result in results:
+            if not report_site(result):
+                all_success = False
+            print()
 
-        # 3. PPTXファイル一覧取得
-        print("3. PPTXファイルの検出...")
-        try:
-            files = await client.list_pptx_files(site_id, drive_id)
-            print(f"   ✅ 検出成功: {len(files)}件のPPTXファイル\n")
-
-            if len(files) == 0:
-                print("   ⚠️  PPTXファイルが見つかりませんでした")
-                print("   SharePointサイトにPPTXファイルをアップロードしてください\n")
-            else:
-                print("   検出されたファイル（最初の10件）:")
-                for i, f in enumerate(files[:10], 1):
-                    size_mb = f['size'] / (1024 * 1024)
-                    print(f"     {i}. {f['name']} ({size_mb:.2f} MB)")
-
-                if len(files) > 10:
-                    print(f"     ... 他 {len(files) - 10}件\n")
-                else:
-                    print()
-
-                # 統計情報
-                total_size = sum(f['size'] for f in files)
-                avg_size = total_size / len(files)
-                print(f"   統計:")
-                print(f"     総ファイル数: {len(files)}")
-                print(f"     総サイズ: {total_size / (1024 * 1024):.2f} MB")
-                print(f"     平均ファイルサイズ: {avg_size / (1024 * 1024):.2f} MB\n")
-
-                # POC想定時間の見積もり
-                estimated_time = len(files) * 30  # 1ファイル30秒想定
-                print(f"   POC想定処理時間:")
-                print(f"     初回フルスキャン: 約{estimated_time // 60}分")
-                print(f"     （1ファイルあたり30秒で計算）\n")
-
-        except Exception as e:
-            print(f"   ❌ 検出失敗: {e}")
+        if not all_success:
             return False
 
         print("="*50)